@@ -0,0 +1,120 @@
+"""
+Response compression with a cache of compressed bodies.
+
+`CompressionMiddleware` picks gzip or, when the `brotli` package is installed,
+brotli from `Accept-Encoding`. Responses from the content response cache
+(`explore.caching`) carry their cache key; their compressed bodies are stored
+under that key, the media type and the encoding, compressed once at a high
+level and reused until the content version changes. Other responses are
+compressed per request at a cheaper level.
+"""
+import gzip
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+# (per-request level, cached level)
+LEVELS = {'br': (4, 11), 'gzip': (5, 9)}
+
+_split_re = _lazy_re_compile(r'\s*,\s*')
+
+def available_encodings():
+    # In order of preference
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate(accept_encoding):
+    """Return the preferred encoding acceptable under `accept_encoding`, or None."""
+    weights = {}
+    for item in _split_re.split(accept_encoding.strip().lower()):
+        coding, _, params = item.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+    default = weights.get('*', 0.0)
+    candidates = [(weights.get(coding, default), -index, coding) for index, coding in enumerate(available_encodings())]
+    q, _, coding = max(candidates)
+    return coding if q > 0 else None
+
+def compress(body, encoding, cached=False):
+    level = LEVELS[encoding][cached]
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+def is_compressible(content_type):
+    media_type = content_type.split(';')[0].strip()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith('+json')
+
+def body_key(cache_key, media_type, encoding):
+    return f'{cache_key}:{media_type}:{encoding}'
+
+def _finalize(response, body, encoding):
+    response.content = body
+    response['Content-Length'] = str(len(body))
+    response['Content-Encoding'] = encoding
+    # Compressed and identity bodies differ, so their ETags can only be weak
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+def cached_response(request, cache_key, media_type):
+    """Return a ready-made compressed response for a response cache hit, if one is stored."""
+    if not settings.RESPONSE_COMPRESSION_ENABLED:
+        return None
+    encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if encoding is None:
+        return None
+    stored = cache.get(body_key(cache_key, media_type, encoding))
+    if stored is None:
+        return None
+    content_type, body = stored
+    response = HttpResponse(content_type=content_type)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return _finalize(response, body, encoding)
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not settings.RESPONSE_COMPRESSION_ENABLED:
+            return response
+        if response.streaming or response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not is_compressible(content_type):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        cache_key = getattr(response, 'compression_cache_key', None)
+        if cache_key is None:
+            return _finalize(response, compress(response.content, encoding), encoding)
+
+        key = body_key(cache_key, content_type.split(';')[0].strip(), encoding)
+        stored = cache.get(key)
+        if stored is None:
+            stored = (content_type, compress(response.content, encoding, cached=True))
+            cache.set(key, stored, settings.RESPONSE_CACHE_TIMEOUT)
+        return _finalize(response, stored[1], encoding)
@@ -0,0 +1,78 @@
+class SparseFieldsSerializerMixin:
+    """
+    Accepts a `fields` argument restricting which fields are serialized.
+
+    Serializers can declare `Meta.card_fields` for the compact listing-card
+    representation and `Meta.field_columns` mapping serializer fields to the
+    model columns they read when that isn't simply the field's source.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_columns(cls, fields):
+        # Model columns needed to render `fields`
+        model = cls.Meta.model
+        concrete = {field.name for field in model._meta.concrete_fields}
+        field_columns = getattr(cls.Meta, 'field_columns', {})
+        declared = cls._declared_fields
+        columns = {'pk'}
+        for name in fields:
+            if name in field_columns:
+                columns.update(field_columns[name])
+                continue
+            source = getattr(declared.get(name), 'source', None) or name
+            if source in concrete:
+                columns.add(source)
+        return columns
+
+
+class SparseFieldsViewMixin:
+    """
+    Adds `?fields=a,b` and `?view=card` to a viewset's list-style actions.
+
+    Both the serialized fields and the selected SQL columns are restricted.
+    `retrieve` and write actions always return the full representation.
+    """
+    sparse_fields_query_param = 'fields'
+    sparse_view_query_param = 'view'
+
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method != 'GET' or self.action == 'retrieve':
+            return None
+        serializer_class = self.get_serializer_class()
+        params = self.request.query_params
+        if params.get(self.sparse_view_query_param) == 'card':
+            return list(serializer_class.Meta.card_fields)
+        requested = params.get(self.sparse_fields_query_param)
+        if not requested:
+            return None
+        available = serializer_class.Meta.fields
+        fields = [name for name in requested.split(',') if name in available]
+        return ['id'] + [name for name in fields if name != 'id']
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            columns = self.get_serializer_class().get_columns(fields) | self.get_ordering_columns(queryset)
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_ordering_columns(self, queryset):
+        # Columns the paginator reads off each row to build its cursors
+        get_order_field = getattr(self.paginator, 'get_order_field', None)
+        order_field = get_order_field(queryset, self) if get_order_field else None
+        if not order_field or order_field.lstrip('-') in queryset.query.annotations:
+            return set()
+        return {order_field.lstrip('-')}
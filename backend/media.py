@@ -0,0 +1,335 @@
+"""
+Media manifest and content-hashed media URLs.
+
+Uploaded files live under MEDIA_ROOT, with older ones also shipped under
+STATIC_ROOT/media. The manifest maps each logical media path (e.g.
+`destinations/cloud9.jpg`) to the file that serves it and a hash of its
+content, so requests are resolved with a dict lookup instead of probing the
+filesystem. It is built on first use, updated by `HashedMediaStorage` on upload
+and delete, and persisted to MEDIA_MANIFEST_PATH so hashes survive restarts
+without re-reading unchanged files. Where that path isn't writable (e.g. a
+read-only serverless deployment) nothing is hashed up front; each file is
+hashed the first time it is requested.
+
+`HashedMediaStorage.url()` returns `destinations/cloud9.<hash>.jpg`. Those URLs
+never change meaning (stored files are never overwritten in place), so they are
+served with a far-future, immutable Cache-Control.
+
+`serve_media` answers Range requests with 206 and hands the transfer to the
+front proxy (X-Accel-Redirect / X-Sendfile) when MEDIA_SENDFILE is set, so a
+worker isn't tied up for the length of a download.
+"""
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)?$' % HASH_LENGTH)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Read size when streaming without sendfile()
+MEDIA_BLOCK_SIZE = 64 * 1024
+
+@dataclass(frozen=True)
+class MediaEntry:
+    root: str
+    size: int
+    mtime_ns: int
+    hash: str
+
+    def hashed_name(self, name):
+        stem, ext = os.path.splitext(name)
+        return f'{stem}.{self.hash}{ext}'
+
+def media_roots():
+    # In priority order: a file in MEDIA_ROOT shadows a shipped copy
+    return [settings.MEDIA_ROOT, os.path.join(settings.STATIC_ROOT, 'media')]
+
+def file_hash(path):
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+class MediaManifest:
+    def __init__(self):
+        self._entries = None
+        self._missing = {}
+        # Guards building, changing and persisting the entries
+        self._lock = threading.RLock()
+        self._writable = None
+
+    @property
+    def writable(self):
+        if self._writable is None:
+            self._writable = os.access(os.path.dirname(settings.MEDIA_MANIFEST_PATH) or '.', os.W_OK)
+        return self._writable
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._build()
+        return self._entries
+
+    def _build(self):
+        previous = self._read()
+        entries = {}
+        for root in media_roots():
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                for filename in filenames:
+                    if filename.startswith('.'):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, root).replace(os.sep, '/')
+                    if name not in entries:
+                        # Hashes that can't be persisted are left for get() to fill in
+                        entries[name] = self._entry(root, name, previous.get(name), hash=self.writable)
+        self._write(entries)
+        return entries
+
+    def _entry(self, root, name, previous=None, hash=True):
+        stat = os.stat(os.path.join(root, name))
+        if previous and previous.root == root and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return previous
+        return MediaEntry(root, stat.st_size, stat.st_mtime_ns, file_hash(os.path.join(root, name)) if hash else '')
+
+    def _read(self):
+        try:
+            with open(settings.MEDIA_MANIFEST_PATH) as f:
+                return {name: MediaEntry(*values) for name, values in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _write(self, entries):
+        if not self.writable:
+            return
+        with self._lock:
+            data = {name: [e.root, e.size, e.mtime_ns, e.hash] for name, e in entries.items()}
+        tmp_path = f'{settings.MEDIA_MANIFEST_PATH}.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, settings.MEDIA_MANIFEST_PATH)
+        except OSError as e:
+            # e.g. a read-only deployment; the in-memory manifest still works
+            logger.warning("Could not write media manifest: %s", e)
+            self._writable = False
+
+    def get(self, name):
+        entry = self.entries.get(name)
+        if entry is None and time.monotonic() - self._missing.get(name, float('-inf')) > settings.MEDIA_MANIFEST_MISS_TTL:
+            # Possibly added by another process since the manifest was built
+            entry = self.add(name, persist=False)
+        if entry is not None and not entry.hash:
+            entry = self._hash(name, entry)
+        return entry
+
+    def _hash(self, name, entry):
+        try:
+            entry = replace(entry, hash=file_hash(os.path.join(entry.root, name)))
+        except FileNotFoundError:
+            self.discard(name, persist=False)
+            return None
+        with self._lock:
+            self.entries[name] = entry
+        return entry
+
+    def add(self, name, persist=True):
+        self._missing.pop(name, None)
+        for root in media_roots():
+            if os.path.isfile(os.path.join(root, name)):
+                entry = self._entry(root, name)
+                with self._lock:
+                    self.entries[name] = entry
+                if persist:
+                    self._write(self.entries)
+                return entry
+        if len(self._missing) < 10000:
+            self._missing[name] = time.monotonic()
+        return None
+
+    def discard(self, name, persist=True):
+        with self._lock:
+            removed = self.entries.pop(name, None)
+        if removed is not None and persist:
+            self._write(self.entries)
+
+    def resolve(self, path):
+        """Return (name, entry, hashed) for a requested media path, or raise Http404."""
+        path = posixpath.normpath(path).lstrip('/')
+        if path.startswith('.'):
+            raise Http404("Media file not found")
+        match = HASHED_NAME_RE.match(path)
+        if match and path not in self.entries:
+            name = match['stem'] + (match['ext'] or '')
+            entry = self.get(name)
+            if entry is not None:
+                # A stale hash still gets the current file, just not as immutable
+                return name, entry, entry.hash == match['hash']
+        entry = self.get(path)
+        if entry is None:
+            raise Http404("Media file not found")
+        return path, entry, False
+
+    def reset(self):
+        self._entries = None
+        self._missing = {}
+        self._writable = None
+
+manifest = MediaManifest()
+
+class HashedMediaStorage(FileSystemStorage):
+    """Default file storage whose URLs carry the file's content hash."""
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        manifest.add(name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        manifest.discard(name)
+
+    def url(self, name):
+        entry = manifest.get(name) if name else None
+        if entry is not None:
+            name = entry.hashed_name(name)
+        return super().url(name)
+
+class FileRange:
+    """Read-only view of the next `length` bytes of an open file.
+
+    It keeps `fileno()`, so a server with `wsgi.file_wrapper` (gunicorn) still
+    sends it with sendfile(), bounded by the response's Content-Length.
+    """
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+def parse_range(header, size):
+    """
+    Return the (start, end) byte positions, inclusive, requested by a Range
+    header, or None to send the whole file. Multiple ranges are answered with
+    the whole file, which RFC 9110 allows. Raises ValueError if unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size or size == 0:
+        raise ValueError(header)
+    return start, end
+
+def _range_applies(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a media file. Conditional and Range requests are answered here; the
+    body is offloaded to the front proxy when MEDIA_SENDFILE is configured and
+    otherwise streamed from the open file.
+    """
+    name, entry, hashed = manifest.resolve(path)
+    full_path = os.path.join(entry.root, name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    etag = f'"{entry.hash}"'
+    last_modified = entry.mtime_ns / 1e9
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None and settings.MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+            relative = os.path.relpath(full_path, settings.MEDIA_SENDFILE_ROOT).replace(os.sep, '/')
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + relative)
+        else:
+            response['X-Sendfile'] = full_path
+    elif response is None:
+        try:
+            file = open(full_path, 'rb')
+        except FileNotFoundError:
+            # Removed behind our back
+            manifest.discard(name, persist=False)
+            raise Http404("Media file not found")
+        size = os.fstat(file.fileno()).st_size
+
+        byte_range = None
+        if 'Range' in request.headers and _range_applies(request, etag, last_modified):
+            try:
+                byte_range = parse_range(request.headers['Range'], size)
+            except ValueError:
+                file.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        if request.method == 'HEAD':
+            file.close()
+            response = HttpResponse(content_type=content_type)
+        else:
+            file.seek(start)
+            response = FileResponse(FileRange(file, length), content_type=content_type)
+            response.block_size = MEDIA_BLOCK_SIZE
+        response['Content-Length'] = length
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if hashed else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    return response
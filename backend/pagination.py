@@ -0,0 +1,142 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _positive_int
+from rest_framework.utils.urls import replace_query_param
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on (ordering field, id).
+
+    Each page is fetched with a `WHERE (field, id) < (value, last_id)` style
+    filter instead of an OFFSET, so with an index on (field, id) deep pages
+    cost the same as the first one. The ordering field comes from the
+    queryset's `order_by()`, then the view's `pagination_ordering`, then the
+    model's Meta ordering, and may be an annotation (e.g. search relevance).
+    Querysets ordered by an expression fall back to offset cursors.
+
+    Pass `?paginate=false` to get the whole, unpaginated list.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-created_at'
+    unpaginated_query_param = 'paginate'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.unpaginated_query_param, '').lower() in ('false', '0'):
+            return None
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.order_field = self.get_order_field(queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.order_field is None:
+            return self.paginate_by_offset(queryset)
+
+        reverse = bool(self.cursor and self.cursor['r'])
+        descending = self.order_field.startswith('-')
+        field = self.order_field.lstrip('-')
+        ordering = [f'-{field}', '-pk'] if descending != reverse else [field, 'pk']
+        queryset = queryset.order_by(*ordering)
+
+        if self.cursor and 'p' in self.cursor:
+            # The ordering field may be an annotation, such as a search score
+            annotation = queryset.query.annotations.get(field)
+            output_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(field)
+            try:
+                value = output_field.to_python(self.cursor['p'])
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if descending != reverse else 'gt'
+            # The redundant `field <= value` bound lets the planner seek into the
+            # (field, id) index instead of scanning it from the start
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'pk__{lookup}': self.cursor['i']})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(self.cursor and 'p' in self.cursor)
+
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def paginate_by_offset(self, queryset):
+        offset = self.cursor.get('o', 0) if self.cursor else 0
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.offset = offset
+        self.has_next = len(results) > self.page_size
+        self.has_previous = offset > 0
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_order_field(self, queryset, view):
+        ordering = queryset.query.order_by
+        if ordering and not isinstance(ordering[0], str):
+            # Ordered by an expression, such as search rank
+            return None
+        ordering = (
+            ordering
+            or getattr(view, 'pagination_ordering', None)
+            or queryset.model._meta.ordering
+            or (self.ordering,)
+        )
+        return ordering[0] if isinstance(ordering, (list, tuple)) else ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.order_field is None:
+            return self.encode_cursor({'o': self.offset + self.page_size})
+        return self.encode_cursor(self.position(self.page[-1], reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.order_field is None:
+            return self.encode_cursor({'o': max(self.offset - self.page_size, 0)})
+        if not self.page:
+            return self.encode_cursor({'r': 1, 'p': self.cursor['p'], 'i': self.cursor['i']})
+        return self.encode_cursor(self.position(self.page[0], reverse=True))
+
+    def position(self, instance, reverse):
+        value = getattr(instance, self.order_field.lstrip('-'))
+        return {'r': int(reverse), 'p': str(value), 'i': instance.pk}
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = dict(parse.parse_qsl(querystring, keep_blank_values=True))
+            cursor = {'r': bool(int(tokens.get('r', '0')))}
+            if 'o' in tokens:
+                cursor['o'] = _positive_int(tokens['o'], cutoff=self.offset_cutoff)
+            if 'p' in tokens:
+                cursor['p'] = tokens['p']
+                cursor['i'] = int(tokens['i'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        querystring = parse.urlencode(cursor)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -14,6 +14,15 @@ MIDDLEWARE = ['whitenoise.middleware.WhiteNoiseMiddleware'] + MIDDLEWARE
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# No browsable API in production, whatever DEBUG was when settings loaded
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+}
+
 # Database
 # Use the DATABASE_URL environment variable
 import dj_database_url
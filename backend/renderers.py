@@ -0,0 +1,71 @@
+"""
+orjson-based JSON renderer/parser, an optional MessagePack renderer, and a
+base for formats that views stream themselves.
+
+The JSON and MessagePack renderers fall back to DRF's JSONEncoder for types
+they don't handle natively (Decimal, lazy strings, ...) and for datetimes, so
+their output matches `rest_framework.renderers.JSONRenderer`.
+"""
+import orjson
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.utils import encoders
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_default = encoders.JSONEncoder().default
+
+class ORJSONRenderer(renderers.BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        renderer_context = renderer_context or {}
+        # The browsable API asks for indented JSON; orjson only indents by two
+        if renderer_context.get('indent') or 'indent=' in (accepted_media_type or ''):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Selected with `Accept: application/msgpack` or `?format=msgpack`. Needs the `msgpack` package."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+class StreamedFormatRenderer(renderers.BaseRenderer):
+    """
+    Base for formats whose responses the view streams itself (CSV exports,
+    iCalendar feeds). Subclasses set `media_type` and `format` so content
+    negotiation and format suffixes can select them; only error responses
+    are rendered here, as text.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode(self.charset)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from datetime import timedelta
@@ -60,6 +61,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'backend.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Added for CORS
     'django.middleware.common.CommonMiddleware',
@@ -115,6 +117,30 @@ else:
     }
 
 
+# Cache
+# The default in-process cache is fine for the response cache: entries are
+# keyed on content versions stored in the database, so every worker sees an
+# edit immediately. Point CACHE_BACKEND/CACHE_LOCATION at a shared cache to
+# share entries (and hit/miss counters) between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'visita-siargao'),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    }
+}
+
+# Cache anonymous content reads (explore and events)
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True') == 'True'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '3600'))
+
+# gzip/brotli response compression (see backend.compression). Bodies of
+# cached responses are compressed once and stored next to them.
+RESPONSE_COMPRESSION_ENABLED = os.getenv('RESPONSE_COMPRESSION_ENABLED', 'True') == 'True'
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -159,6 +185,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 if not DEBUG:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploads are stored on the local filesystem with content-hashed URLs (see
+# backend.media). Django 5.1 ignores STATICFILES_STORAGE, so static files keep
+# the plain storage.
+STORAGES = {
+    'default': {'BACKEND': 'backend.media.HashedMediaStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_MANIFEST_PATH = os.getenv('MEDIA_MANIFEST_PATH', os.path.join(MEDIA_ROOT, '.manifest.json'))
+# Seconds a media path found missing is remembered before the disk is checked again
+MEDIA_MANIFEST_MISS_TTL = int(os.getenv('MEDIA_MANIFEST_MISS_TTL', '60'))
+# Cache lifetime of media requested by its plain, unhashed URL
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', '3600'))
+# Let the front proxy send media bodies: 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache/lighttpd). For nginx, map MEDIA_ACCEL_REDIRECT_PREFIX to
+# MEDIA_SENDFILE_ROOT with an `internal` location. Empty streams from Django.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_SENDFILE_ROOT = os.getenv('MEDIA_SENDFILE_ROOT', str(BASE_DIR))
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/internal-media/')
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -178,12 +223,41 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'backend.renderers.ORJSONRenderer',
+        # MessagePack for clients sending `Accept: application/msgpack`
+        *(['backend.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'backend.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Serve destination categories from the denormalized `category_snapshot`
+# column instead of joining the categories table for every listing
+DESTINATION_CATEGORY_SNAPSHOT = os.getenv('DESTINATION_CATEGORY_SNAPSHOT', 'True') == 'True'
+
+# Derivatives generated for uploaded content images (see explore.images).
+# Formats the installed Pillow cannot encode are skipped.
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',')]
+IMAGE_VARIANT_FORMATS = os.getenv('IMAGE_VARIANT_FORMATS', 'avif,webp,jpeg').split(',')
+IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+
+# Background jobs (see users.jobs), run by `manage.py run_jobs`
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+# Seconds without progress after which a running job's worker is presumed dead
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '600'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# A job whose handler raises is retried after JOB_RETRY_BACKOFF seconds,
+# doubling each time up to JOB_RETRY_BACKOFF_MAX
+JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', '30'))
+JOB_RETRY_BACKOFF_MAX = int(os.getenv('JOB_RETRY_BACKOFF_MAX', '1800'))
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -207,7 +281,39 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', 'visitasiargao@gmail.com')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 
+# Newsletter delivery: parallel connections, messages/sec cap (0: none) and
+# retries on a dropped connection
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', '4'))
+EMAIL_RATE_LIMIT = float(os.getenv('EMAIL_RATE_LIMIT', '0'))
+EMAIL_SEND_RETRIES = int(os.getenv('EMAIL_SEND_RETRIES', '1'))
+# Newsletter transport: smtp, console, file, mbox or a backend path; empty
+# uses EMAIL_BACKEND. file writes to EMAIL_FILE_PATH, mbox to EMAIL_MBOX_PATH
+NEWSLETTER_TRANSPORT = os.getenv('NEWSLETTER_TRANSPORT', '')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+EMAIL_MBOX_PATH = os.getenv('EMAIL_MBOX_PATH', os.path.join(BASE_DIR, 'sent_emails.mbox'))
+
+# Failed newsletter deliveries are retried with exponential backoff: after
+# NEWSLETTER_RETRY_BACKOFF seconds, doubling each time up to
+# NEWSLETTER_RETRY_BACKOFF_MAX, for NEWSLETTER_MAX_ATTEMPTS attempts in all
+NEWSLETTER_MAX_ATTEMPTS = int(os.getenv('NEWSLETTER_MAX_ATTEMPTS', '5'))
+NEWSLETTER_RETRY_BACKOFF = int(os.getenv('NEWSLETTER_RETRY_BACKOFF', '60'))
+NEWSLETTER_RETRY_BACKOFF_MAX = int(os.getenv('NEWSLETTER_RETRY_BACKOFF_MAX', '3600'))
+
+# Public base URL of this API, used for links in outgoing email
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+
 # Admin email for receiving notifications
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'visitasiargao@gmail.com')
 
+# Contact form emails go through an outbox drained by the job worker. Once
+# CONTACT_DIGEST_THRESHOLD admin notifications (0: never) were queued within
+# CONTACT_DIGEST_INTERVAL seconds, further ones are held and sent as a digest
+# at the end of the interval. Failed sends are retried after
+# OUTBOX_RETRY_BACKOFF seconds, doubling up to OUTBOX_RETRY_BACKOFF_MAX
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_BACKOFF = int(os.getenv('OUTBOX_RETRY_BACKOFF', '30'))
+OUTBOX_RETRY_BACKOFF_MAX = int(os.getenv('OUTBOX_RETRY_BACKOFF_MAX', '1800'))
+CONTACT_DIGEST_THRESHOLD = int(os.getenv('CONTACT_DIGEST_THRESHOLD', '0'))
+CONTACT_DIGEST_INTERVAL = int(os.getenv('CONTACT_DIGEST_INTERVAL', '900'))
+
 # Default email to display in the 
@@ -0,0 +1,93 @@
+import io
+import os
+import tempfile
+from django.test import TestCase, override_settings
+from .media import FileRange, manifest, parse_range
+
+class ParseRangeTests(TestCase):
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-0', 1000, (0, 0)),
+            ('bytes=0-499', 1000, (0, 499)),
+            ('bytes=500-', 1000, (500, 999)),
+            ('bytes=999-', 1000, (999, 999)),
+            # The end is clamped to the last byte
+            ('bytes=990-2000', 1000, (990, 999)),
+            # Suffix ranges: the final N bytes, or the whole file if it's shorter
+            ('bytes=-500', 1000, (500, 999)),
+            ('bytes=-1', 1000, (999, 999)),
+            ('bytes=-5000', 1000, (0, 999)),
+        ]
+        for header, size, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, size), expected)
+
+    def test_whole_file(self):
+        # Multiple, malformed and backwards ranges are answered with the whole file
+        for header in ['bytes=0-10,20-30', 'bytes=-', 'items=0-10', 'bytes=abc', 'bytes=10-5']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header, size in [('bytes=1000-', 1000), ('bytes=1500-2000', 1000), ('bytes=-0', 1000), ('bytes=0-', 0), ('bytes=-5', 0)]:
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(ValueError):
+                    parse_range(header, size)
+
+class FileRangeTests(TestCase):
+    def test_reads_stop_at_length(self):
+        file = io.BytesIO(b'0123456789')
+        file.seek(2)
+        part = FileRange(file, 5)
+        self.assertEqual(part.read(3), b'234')
+        self.assertEqual(part.read(), b'56')
+        self.assertEqual(part.read(), b'')
+
+class ServeMediaRangeTests(TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        os.makedirs(os.path.join(tmp.name, 'media', 'events'))
+        os.makedirs(os.path.join(tmp.name, 'static', 'media'))
+        with open(os.path.join(tmp.name, 'media', 'events', 'poster.jpg'), 'wb') as f:
+            f.write(self.content)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(tmp.name, 'media'),
+            STATIC_ROOT=os.path.join(tmp.name, 'static'),
+            MEDIA_MANIFEST_PATH=os.path.join(tmp.name, 'manifest.json'),
+            MEDIA_SENDFILE='',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        manifest.reset()
+        self.addCleanup(manifest.reset)
+
+    def get(self, range_header):
+        response = self.client.get('/media/events/poster.jpg', headers={'Range': range_header})
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_suffix_range(self):
+        response, body = self.get('bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 924-1023/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(body, self.content[-100:])
+
+    def test_open_ended_range(self):
+        response, body = self.get('bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(body, self.content[1000:])
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get('bytes=1024-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_multiple_ranges_get_the_whole_file(self):
+        response, body = self.get('bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(body, self.content)
@@ -21,9 +21,8 @@ from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
-import os
-from django.http import FileResponse, JsonResponse
-from django.views.static import serve
+from django.http import JsonResponse
+from .media import serve_media
 
 # API documentation setup
 schema_view = get_schema_view(
@@ -38,27 +37,6 @@ schema_view = get_schema_view(
     permission_classes=[permissions.AllowAny],
 )
 
-# Custom view to serve media files
-def serve_media_file(request, path):
-    # First try to serve from media directory
-    media_path = os.path.join(settings.MEDIA_ROOT, path)
-    if os.path.exists(media_path) and os.path.isfile(media_path):
-        return serve(request, path, document_root=settings.MEDIA_ROOT)
-    
-    # If not found, try to serve from static/media directory
-    static_media_path = os.path.join(settings.STATIC_ROOT, 'media', path)
-    if os.path.exists(static_media_path) and os.path.isfile(static_media_path):
-        return serve(request, os.path.join('media', path), document_root=settings.STATIC_ROOT)
-    
-    # If not found, try to serve from staticfiles/media directory
-    staticfiles_media_path = os.path.join(settings.STATIC_ROOT, 'media', path)
-    if os.path.exists(staticfiles_media_path) and os.path.isfile(staticfiles_media_path):
-        return serve(request, os.path.join('media', path), document_root=settings.STATIC_ROOT)
-    
-    # If all else fails, return 404
-    from django.http import Http404
-    raise Http404("Media file not found")
-
 # Simple view to confirm API is working
 def api_root(request):
     return JsonResponse({
@@ -85,20 +63,10 @@ urlpatterns = [
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
     
-    # Custom URL pattern to serve media files
-    re_path(r'^media/(?P<path>.*)$', serve_media_file, name='serve_media_file'),
+    # Media from MEDIA_ROOT or STATIC_ROOT/media, resolved through the media manifest
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='serve_media_file'),
 ]
 
-# Serve media files in development
+# Serve static files in development
 if settings.DEBUG:
-    # First, try to serve from the media directory
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    
-    # Additional fallback for media files
-    media_static_dir = os.path.join(settings.STATIC_ROOT, 'media')
-    if os.path.exists(media_static_dir):
-        urlpatterns += static('/media/', document_root=media_static_dir)
-else:
-    # In production, ensure media files are properly served
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        from explore import caching, images, search
+        from .models import Event
+        
+        search.register('event', Event, title=['title'], body=['description'])
+        images.register(Event)
+        caching.track(Event)
@@ -0,0 +1,61 @@
+"""
+iCalendar (RFC 5545) output for events.
+
+`calendar_chunks()` yields the feed one event at a time, so it can be
+streamed straight from a queryset iterator.
+"""
+import datetime
+from django.utils import timezone
+from backend.renderers import StreamedFormatRenderer
+
+PRODID = '-//Visita Siargao//Events//EN'
+
+class ICalendarRenderer(StreamedFormatRenderer):
+    media_type = 'text/calendar'
+    format = 'ics'
+
+def escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+def fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(pieces) + '\r\n'
+
+def event_lines(event, host):
+    stamp = (event.updated_at or timezone.now()).astimezone(datetime.timezone.utc)
+    yield fold('BEGIN:VEVENT')
+    yield fold(f'UID:event-{event.pk}@{host}')
+    yield fold(f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}")
+    yield fold(f"DTSTART;VALUE=DATE:{event.date.strftime('%Y%m%d')}")
+    yield fold(f"DTEND;VALUE=DATE:{(event.date + datetime.timedelta(days=1)).strftime('%Y%m%d')}")
+    yield fold(f'SUMMARY:{escape(event.title)}')
+    if event.description:
+        yield fold(f'DESCRIPTION:{escape(event.description)}')
+    yield fold('END:VEVENT')
+
+def calendar_chunks(events, host='localhost', name='Siargao Events'):
+    yield ''.join([
+        fold('BEGIN:VCALENDAR'),
+        fold('VERSION:2.0'),
+        fold(f'PRODID:{PRODID}'),
+        fold('CALSCALE:GREGORIAN'),
+        fold(f'X-WR-CALNAME:{escape(name)}'),
+    ])
+    for event in events:
+        yield ''.join(event_lines(event, host))
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from explore import search
+
+
+def create_search_index(apps, schema_editor):
+    spec = search.get_spec('event')
+    search.create_table(schema_editor, spec.table)
+    search.rebuild(spec, apps.get_model('events', 'Event').objects.all())
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_table(schema_editor, search.get_spec('event').table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
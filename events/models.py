@@ -5,6 +5,7 @@ from django.db import models
 class Event(models.Model):
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='events/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized/re-encoded copies of image, kept in sync by explore.images")
     description = models.TextField()
     date = models.DateField()
     month = models.CharField(max_length=20)  # To easily filter events by month
@@ -19,3 +20,8 @@ class Event(models.Model):
         if self.date:
             self.month = self.date.strftime('%B')
         super().save(*args, **kwargs)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='event_date_id_idx'),
+        ]
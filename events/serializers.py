@@ -1,10 +1,14 @@
 from rest_framework import serializers
+from backend.fieldsets import SparseFieldsSerializerMixin
+from explore.images import ImageVariantsSerializerMixin
 from .models import Event
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsSerializerMixin, ImageVariantsSerializerMixin, serializers.ModelSerializer):
     month_name = serializers.CharField(source='month', read_only=True)
     
     class Meta:
         model = Event
-        fields = ['id', 'title', 'image', 'description', 'date', 'month_name', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'image', 'image_variants', 'srcset', 'description', 'date', 'month_name', 'created_at', 'updated_at']
         read_only_fields = ['month']
+        card_fields = ['id', 'title', 'image', 'srcset', 'date', 'month_name']
+        field_columns = {'srcset': ['image_variants']}
@@ -1,3 +1,32 @@
+import datetime
+from unittest import mock
+from django.core.cache import cache
 from django.test import TestCase
+from .models import Event
 
 # Create your tests here.
+
+class ImpliedYearCacheTests(TestCase):
+    def setUp(self):
+        # Cached responses outlive the content versions rolled back after each test
+        cache.clear()
+        Event.objects.create(title='Surfing Cup', description='Cloud 9', date=datetime.date(2025, 3, 8))
+        Event.objects.create(title='Surfing Cup', description='Cloud 9', date=datetime.date(2026, 3, 7))
+
+    def get_on(self, url, today):
+        with mock.patch('django.utils.timezone.localdate', return_value=today):
+            response = self.client.get(url)
+        return response
+
+    def test_month_without_year_follows_the_current_year(self):
+        before = self.get_on('/api/events/by_month/?month=3', datetime.date(2025, 12, 31))
+        after = self.get_on('/api/events/by_month/?month=3', datetime.date(2026, 1, 1))
+        self.assertEqual([event['date'] for event in before.json()['results']], ['2025-03-08'])
+        self.assertEqual([event['date'] for event in after.json()['results']], ['2026-03-07'])
+        self.assertNotEqual(before['ETag'], after['ETag'])
+
+    def test_calendar_without_year_follows_the_current_year(self):
+        before = self.get_on('/api/events/calendar/', datetime.date(2025, 12, 31))
+        after = self.get_on('/api/events/calendar/', datetime.date(2026, 1, 1))
+        self.assertEqual(before.json()['year'], 2025)
+        self.assertEqual(after.json()['year'], 2026)
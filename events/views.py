@@ -2,48 +2,151 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from .models import Event
 from .serializers import EventSerializer
+from .ical import ICalendarRenderer, calendar_chunks
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from explore import search
+from backend.fieldsets import SparseFieldsViewMixin
+from explore.caching import CachedContentMixin, cached_content
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime
+from calendar import month_abbr, month_name
+import datetime
+
+MONTH_NAMES = {name.lower(): number for number, name in enumerate(month_name) if name}
+MONTH_NAMES.update({name.lower(): number for number, name in enumerate(month_abbr) if name})
+
+def parse_month(value):
+    """Month number for '3', 'march' or 'Mar', or None."""
+    if value.isdigit():
+        month = int(value)
+        return month if 1 <= month <= 12 else None
+    return MONTH_NAMES.get(value.strip().lower())
+
+def parse_year(value):
+    if value is None:
+        return timezone.localdate().year
+    return int(value) if value.isdigit() and datetime.MINYEAR <= int(value) < datetime.MAXYEAR else None
+
+def month_range(year, month):
+    # Half-open [first day, first day of next month), so `date` stays indexable
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return start, end
 
 # Create your views here.
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(CachedContentMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Event.objects.all().order_by('-date')
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_dependencies = ('events.event',)
+    upcoming_default_limit = 10
+    upcoming_max_limit = 100
+    
+    def get_base_queryset(self):
+        return Event.objects.all().order_by('-date')
     
     def get_queryset(self):
-        queryset = Event.objects.all().order_by('-date')
+        queryset = self.get_base_queryset()
         
         month = self.request.query_params.get('month')
         if month:
-            try:
-                # Get events for the specified month
-                month_number = int(month)
-                current_year = timezone.now().year
-                
-                # Filter events by month
-                queryset = queryset.filter(date__year=current_year, date__month=month_number)
-            except ValueError:
-                pass  # Invalid month parameter, return all events
+            # Events in the given month of `year` (default: this year); invalid values are ignored
+            month = parse_month(month)
+            year = parse_year(self.request.query_params.get('year'))
+            if month and year:
+                start, end = month_range(year, month)
+                queryset = queryset.filter(date__gte=start, date__lt=end)
         
         search_query = self.request.query_params.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query)
-            )
+            queryset = search.search(queryset, 'event', search_query)
         
         return queryset
     
     @action(detail=False, methods=['get'])
+    @cached_content
     def by_month(self, request):
         month = request.query_params.get('month')
-        if month:
-            events = Event.objects.filter(month__iexact=month).order_by('date')
-            serializer = self.get_serializer(events, many=True)
-            return Response(serializer.data)
-        return Response({'error': 'Month parameter is required'}, status=400)
+        if not month:
+            return Response({'error': 'Month parameter is required'}, status=400)
+        month = parse_month(month)
+        year = parse_year(request.query_params.get('year'))
+        if not (month and year):
+            return Response({'error': 'Invalid month or year'}, status=400)
+        
+        start, end = month_range(year, month)
+        events = self.filter_queryset(Event.objects.filter(date__gte=start, date__lt=end).order_by('date'))
+        page = self.paginate_queryset(events)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = self.get_serializer(events, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    @cached_content
+    def calendar(self, request):
+        """Per-month and per-day event counts for `?year=` (default: this year)."""
+        year = parse_year(request.query_params.get('year'))
+        if not year:
+            return Response({'error': 'Invalid year'}, status=400)
+        
+        day_counts = (
+            Event.objects.filter(date__gte=datetime.date(year, 1, 1), date__lt=datetime.date(year + 1, 1, 1))
+            .values('date').annotate(count=Count('id')).order_by('date')
+        )
+        months = [
+            {'month': number, 'name': month_name[number], 'count': 0, 'days': []}
+            for number in range(1, 13)
+        ]
+        for row in day_counts:
+            month = months[row['date'].month - 1]
+            month['count'] += row['count']
+            month['days'].append({'date': row['date'], 'count': row['count']})
+        return Response({
+            'year': year,
+            'total': sum(month['count'] for month in months),
+            'months': months,
+        })
+    
+    def get_cache_variant(self, request):
+        # What counts as upcoming changes at midnight even if no event does
+        if self.action == 'upcoming':
+            return timezone.localdate().isoformat()
+        # Without `?year=` the month filter and calendar mean this year, which changes on New Year
+        params = request.query_params
+        if 'year' not in params and (self.action == 'calendar' or params.get('month')):
+            return timezone.localdate().year
+        return None
+    
+    @action(detail=False, methods=['get'])
+    @cached_content
+    def upcoming(self, request):
+        """The next `?limit=` events (default 10, at most 100) from today on."""
+        try:
+            limit = min(int(request.query_params.get('limit', self.upcoming_default_limit)), self.upcoming_max_limit)
+        except ValueError:
+            limit = self.upcoming_default_limit
+        limit = max(limit, 1)
+        
+        events = self.filter_queryset(Event.objects.filter(date__gte=timezone.localdate()).order_by('date', 'pk'))
+        serializer = self.get_serializer(events[:limit], many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[ICalendarRenderer])
+    @cached_content
+    def feed(self, request, format=None):
+        """All events as an iCalendar feed, also at `/api/events/feed.ics`."""
+        events = (
+            Event.objects.order_by('date', 'pk')
+            .only('pk', 'title', 'description', 'date', 'updated_at')
+            .iterator(chunk_size=500)
+        )
+        response = StreamingHttpResponse(
+            calendar_chunks(events, host=request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="siargao-events.ics"'
+        return response
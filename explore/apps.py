@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class ExploreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'explore'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import caching, images, search
+        from .models import Category, Destination, Activity, Culture
+        
+        search.register('destination', Destination, title=['title'], summary=['short_description'], body=['long_description'])
+        search.register('activity', Activity, title=['title'], summary=['short_description'], body=['long_description', 'tips'])
+        search.register('culture', Culture, title=['title'], summary=['short_description'], body=['long_description'])
+        
+        for model in [Destination, Activity, Culture]:
+            images.register(model)
+        
+        for model in [Category, Destination, Activity, Culture]:
+            caching.track(model)
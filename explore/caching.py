@@ -0,0 +1,195 @@
+"""
+Conditional GET and response caching for content reads.
+
+Every tracked model has a version counter in `ContentVersion` that is bumped
+by save/delete/M2M signals. One small query for the versions a view depends
+on gives a validator for the response before any content is loaded:
+
+* `ETag`/`Last-Modified` are derived from it, so `If-None-Match` and
+  `If-Modified-Since` are answered with 304 without running the view.
+* Anonymous responses are cached under the ETag, so an edit makes old
+  entries unreachable at once without having to find and delete them.
+
+Responses carrying `is_favorite` also depend on a per-user favorites version,
+bumped whenever one of the user's favorites is added or removed.
+"""
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from rest_framework.response import Response
+from backend import compression
+from .models import ContentVersion, Favorite
+
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+def model_key(model):
+    return model._meta.label_lower
+
+def bump(key):
+    versions = ContentVersion.objects.filter(key=key)
+    if versions.update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            ContentVersion.objects.create(key=key, version=1)
+    except IntegrityError:
+        # Created concurrently
+        versions.update(version=F('version') + 1, updated_at=timezone.now())
+
+def get_versions(keys):
+    """Return the current versions of `keys` and when the latest of them changed."""
+    rows = {key: (version, updated_at) for key, version, updated_at in
+            ContentVersion.objects.filter(key__in=keys).values_list('key', 'version', 'updated_at')}
+    versions = [rows.get(key, (0, None))[0] for key in keys]
+    timestamps = [updated_at for version, updated_at in rows.values()]
+    return versions, max(timestamps) if timestamps else None
+
+def favorites_key(user_id):
+    return f'favorites:user:{user_id}'
+
+def bump_favorites(user_id):
+    """Invalidate `is_favorite` in the user's responses; bulk changes that skip signals must call this."""
+    bump(favorites_key(user_id))
+
+def _bump_favorite(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_favorites(instance.user_id)
+
+post_save.connect(_bump_favorite, sender=Favorite, dispatch_uid='favorites-version-save')
+post_delete.connect(_bump_favorite, sender=Favorite, dispatch_uid='favorites-version-delete')
+
+def _bump_sender(sender, **kwargs):
+    if not kwargs.get('raw'):
+        bump(model_key(sender))
+
+def _bump_m2m(sender, instance, action, model, **kwargs):
+    if action.startswith('post_'):
+        bump(model_key(type(instance)))
+        bump(model_key(model))
+
+def track(model):
+    """Bump `model`'s version whenever a row or one of its M2M relations changes."""
+    key = model_key(model)
+    post_save.connect(_bump_sender, sender=model, dispatch_uid=f'content-version-save-{key}')
+    post_delete.connect(_bump_sender, sender=model, dispatch_uid=f'content-version-delete-{key}')
+    for field in model._meta.local_many_to_many:
+        m2m_changed.connect(_bump_m2m, sender=field.remote_field.through, dispatch_uid=f'content-version-m2m-{key}-{field.name}')
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+def stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+def compute_etag(view, request, versions, favorites=None, variant=None):
+    parts = [
+        type(view).__module__,
+        type(view).__name__,
+        getattr(view, 'action', None) or request.method,
+        repr(sorted(view.kwargs.items())),
+        # Serialized image URLs are absolute, so the host is part of the response
+        request.build_absolute_uri('/'),
+        request.GET.urlencode(),
+        request.accepted_renderer.format,
+        repr(versions),
+        repr(favorites),
+        repr(variant),
+    ]
+    return '"%s"' % hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+def serve_cached(view, handler, request, *args, **kwargs):
+    if request.method != 'GET':
+        return handler(request, *args, **kwargs)
+
+    anonymous = not request.user.is_authenticated
+    vary_on_favorites = not anonymous and view.vary_on_favorites
+    keys = list(view.cache_dependencies)
+    if vary_on_favorites:
+        keys.append(favorites_key(request.user.pk))
+    # One query for the content versions and, if needed, the user's favorites version
+    versions, last_modified = get_versions(keys)
+    favorites = None
+    if vary_on_favorites:
+        favorites = versions.pop()
+        # Per-user output; the ETag is the validator
+        last_modified = None
+    # Output that also depends on something besides content, e.g. today's date
+    variant = view.get_cache_variant(request) if hasattr(view, 'get_cache_variant') else None
+    if variant is not None:
+        last_modified = None
+    etag = compute_etag(view, request, versions, favorites, variant)
+    last_modified = last_modified and int(last_modified.timestamp())
+
+    not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    key = 'response:' + etag.strip('"')
+    cached = cache.get(key) if anonymous and settings.RESPONSE_CACHE_ENABLED else None
+    if cached is not None:
+        _count(HITS_KEY)
+        # A compressed body stored by CompressionMiddleware skips rendering entirely
+        response = compression.cached_response(request, key, request.accepted_renderer.media_type)
+        if response is None:
+            response = Response(cached)
+        response['X-Cache'] = 'HIT'
+    else:
+        response = handler(request, *args, **kwargs)
+        if anonymous and settings.RESPONSE_CACHE_ENABLED:
+            _count(MISSES_KEY)
+            if response.status_code == 200 and isinstance(response, Response):
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+
+    if response.status_code == 200:
+        response['ETag'] = 'W/' + etag if response.has_header('Content-Encoding') else etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        if anonymous and settings.RESPONSE_CACHE_ENABLED and not response.streaming:
+            response.compression_cache_key = key
+    return response
+
+def cached_content(handler):
+    """Decorator for GET viewset actions: conditional GET plus the anonymous response cache."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        return serve_cached(self, lambda *a, **kw: handler(self, *a, **kw), request, *args, **kwargs)
+    return wrapper
+
+class CachedContentMixin:
+    """
+    Conditional GET and anonymous caching for `list` and `retrieve`.
+
+    Views list the models their output depends on in `cache_dependencies`
+    (as `app_label.modelname`) and set `vary_on_favorites` when the output
+    includes the per-user `is_favorite` flag. Custom actions opt in with
+    `@cached_content`; those whose output changes on its own (e.g. with the
+    date) return what it depends on from `get_cache_variant()`.
+    """
+    cache_dependencies = ()
+    vary_on_favorites = False
+    
+    def get_cache_variant(self, request):
+        return None
+
+    @cached_content
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_content
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
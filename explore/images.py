@@ -0,0 +1,133 @@
+"""
+Resized and re-encoded derivatives of uploaded content images.
+
+When a registered model is saved with a new image, variants are generated for
+each width in `IMAGE_VARIANT_WIDTHS` and each format in `IMAGE_VARIANT_FORMATS`
+(formats this Pillow build cannot write, e.g. AVIF, are skipped). Their
+storage names are recorded on the row's `image_variants` field, so serializers
+can build `srcset`s without touching the filesystem.
+"""
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save, post_delete
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+FORMAT_EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if fmt.upper() in Image.SAVE]
+
+def variant_name(source_name, width, fmt):
+    stem, _ = os.path.splitext(source_name)
+    return f'variants/{stem}-{width}w.{FORMAT_EXTENSIONS[fmt]}'
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        # No alpha channel in JPEG
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    image.save(buffer, format=fmt.upper(), quality=settings.IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+def generate_variants(source_name):
+    """Write the derivatives of `source_name` to storage and describe them."""
+    with default_storage.open(source_name) as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    widths = sorted({min(width, original.width) for width in settings.IMAGE_VARIANT_WIDTHS})
+    variants = {}
+    for fmt in supported_formats():
+        variants[fmt] = []
+        for width in widths:
+            height = round(original.height * width / original.width)
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            # Storage picks a fresh name on collision: files are never overwritten in place
+            name = default_storage.save(variant_name(source_name, width, fmt), ContentFile(_encode(resized, fmt)))
+            variants[fmt].append({'width': width, 'height': height, 'name': name})
+    return {'source': source_name, 'variants': variants}
+
+def variant_names(image_variants):
+    return {entry['name'] for entries in (image_variants or {}).get('variants', {}).values() for entry in entries}
+
+def delete_variants(image_variants, keep=()):
+    for name in variant_names(image_variants) - set(keep):
+        default_storage.delete(name)
+
+def refresh_variants(instance, field_name='image', force=False):
+    """Regenerate `instance`'s variants if its image changed. Returns True if it did."""
+    image = getattr(instance, field_name)
+    current = instance.image_variants or {}
+    if not force and current.get('source') == (image.name or None):
+        return False
+
+    image_variants = {}
+    if image.name:
+        try:
+            image_variants = generate_variants(image.name)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.warning("Could not generate variants for %s: %s", image.name, e)
+            image_variants = {'source': image.name, 'variants': {}}
+    delete_variants(current, keep=variant_names(image_variants))
+
+    instance.image_variants = image_variants
+    type(instance).objects.filter(pk=instance.pk).update(image_variants=image_variants)
+    # The update above bypasses the save signals
+    caching.bump(caching.model_key(type(instance)))
+    return True
+
+def _image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, _registry[sender])
+
+def _image_deleted(sender, instance, **kwargs):
+    delete_variants(instance.image_variants)
+
+def register(model, field_name='image'):
+    key = model._meta.label_lower
+    _registry[model] = field_name
+    post_save.connect(_image_saved, sender=model, dispatch_uid=f'image-variants-{key}')
+    post_delete.connect(_image_deleted, sender=model, dispatch_uid=f'image-variants-delete-{key}')
+
+def registered_models():
+    return dict(_registry)
+
+class ImageVariantsSerializerMixin(serializers.Serializer):
+    """Adds `image_variants` and `srcset` (per format) to a serializer of a registered model."""
+    image_variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
+    def _variant_urls(self, obj):
+        request = self.context.get('request')
+        variants = {}
+        for fmt, entries in (obj.image_variants or {}).get('variants', {}).items():
+            variants[fmt] = []
+            for entry in entries:
+                url = default_storage.url(entry['name'])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[fmt].append({'width': entry['width'], 'height': entry['height'], 'url': url})
+        return variants
+
+    def get_image_variants(self, obj):
+        return self._variant_urls(obj)
+
+    def get_srcset(self, obj):
+        return {
+            fmt: ', '.join(f"{entry['url']} {entry['width']}w" for entry in entries)
+            for fmt, entries in self._variant_urls(obj).items()
+        }
@@ -0,0 +1,74 @@
+import datetime
+import gzip
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from backend import renderers
+from events.models import Event
+from events.serializers import EventSerializer
+from explore.models import Destination
+from explore.serializers import DestinationSerializer
+
+def sample_variants(name):
+    return {'source': name, 'variants': {
+        fmt: [{'width': width, 'height': width * 2 // 3, 'name': f'variants/{name[:-4]}-{width}w.{ext}'} for width in (320, 640, 1280)]
+        for fmt, ext in [('webp', 'webp'), ('jpeg', 'jpg')]
+    }}
+
+class Command(BaseCommand):
+    help = 'Compare render time and payload size of the JSON/MessagePack renderers on destination and event lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200, help='Rows per list (default: 200)')
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per renderer (default: 50)')
+
+    def destinations(self, count):
+        now = timezone.now()
+        return [
+            Destination(
+                id=i, title=f'Destination {i}', image=f'destinations/destination-{i}.jpg',
+                image_variants=sample_variants(f'destinations/destination-{i}.jpg'),
+                short_description='White sand, clear water and a short walk from General Luna. ' * 3,
+                long_description='A longer description of the place, how to get there and what to bring. ' * 20,
+                location_name='General Luna, Siargao', maps_link='https://maps.google.com/?q=siargao',
+                category_snapshot=[{'id': 1, 'name': 'Beaches'}, {'id': 2, 'name': 'Islands'}],
+                created_at=now, updated_at=now,
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def events(self, count):
+        now = timezone.now()
+        return [
+            Event(
+                id=i, title=f'Event {i}', image=f'events/event-{i}.jpg', image_variants=sample_variants(f'events/event-{i}.jpg'),
+                description='Surf competition, live music and local food stalls along the boardwalk. ' * 10,
+                date=datetime.date(2026, 1, 1) + datetime.timedelta(days=i % 365), month='January',
+                created_at=now, updated_at=now,
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def handle(self, *args, **options):
+        datasets = {
+            'destinations': DestinationSerializer(self.destinations(options['items']), many=True).data,
+            'events': EventSerializer(self.events(options['items']), many=True).data,
+        }
+        candidates = [('drf-json', JSONRenderer()), ('orjson', renderers.ORJSONRenderer())]
+        if renderers.msgpack is not None:
+            candidates.append(('msgpack', renderers.MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack is not installed; skipping MessagePackRenderer')
+
+        self.stdout.write(f"{'list':<14}{'renderer':<10}{'median ms':>11}{'bytes':>10}{'gzip bytes':>12}")
+        for name, data in datasets.items():
+            for label, renderer in candidates:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = renderer.render(data)
+                    timings.append(time.perf_counter() - start)
+                median = statistics.median(timings) * 1000
+                self.stdout.write(f'{name:<14}{label:<10}{median:>11.3f}{len(body):>10}{len(gzip.compress(body)):>12}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from explore import images
+
+class Command(BaseCommand):
+    help = 'Generate resized/re-encoded image variants for destinations, activities, cultures and events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Models to process, e.g. explore.destination (default: all)')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that are already up to date')
+
+    def handle(self, *args, **options):
+        registered = {model._meta.label_lower: (model, field_name) for model, field_name in images.registered_models().items()}
+        labels = options['models'] or list(registered)
+        for label in labels:
+            if label.lower() not in registered:
+                raise CommandError(f'Unknown model "{label}"')
+            model, field_name = registered[label.lower()]
+
+            generated = 0
+            for instance in model.objects.exclude(**{field_name: ''}).only('pk', field_name, 'image_variants').iterator(chunk_size=100):
+                if images.refresh_variants(instance, field_name, force=options['force']):
+                    generated += 1
+            self.stdout.write(self.style.SUCCESS(f'Generated variants for {generated} {label} rows'))
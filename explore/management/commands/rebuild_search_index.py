@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from explore import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for destinations, activities, cultures and events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help='Content types to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('The current database backend has no full-text search index')
+        
+        kinds = options['kinds'] or search.registered_kinds()
+        for kind in kinds:
+            try:
+                spec = search.get_spec(kind)
+            except KeyError:
+                raise CommandError(f'Unknown content type "{kind}"')
+            count = search.rebuild(spec)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {kind} rows'))
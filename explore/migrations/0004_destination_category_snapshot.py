@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:34
+
+from django.db import migrations, models
+
+
+def backfill_category_snapshots(apps, schema_editor):
+    Destination = apps.get_model('explore', 'Destination')
+    for destination in Destination.objects.prefetch_related('categories'):
+        destination.category_snapshot = [
+            {'id': category.id, 'name': category.name}
+            for category in sorted(destination.categories.all(), key=lambda category: category.id)
+        ]
+        destination.save(update_fields=['category_snapshot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('explore', '0003_favorite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='category_snapshot',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Denormalized [{id, name}] copy of categories, kept in sync by signals'),
+        ),
+        migrations.RunPython(backfill_category_snapshots, migrations.RunPython.noop),
+    ]
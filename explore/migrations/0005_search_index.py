@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from explore import search
+
+KINDS = {
+    'destination': 'Destination',
+    'activity': 'Activity',
+    'culture': 'Culture',
+}
+
+
+def create_search_index(apps, schema_editor):
+    for kind, model_name in KINDS.items():
+        spec = search.get_spec(kind)
+        search.create_table(schema_editor, spec.table)
+        search.rebuild(spec, apps.get_model('explore', model_name).objects.all())
+
+
+def drop_search_index(apps, schema_editor):
+    for kind in KINDS:
+        search.drop_table(schema_editor, search.get_spec(kind).table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('explore', '0004_destination_category_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
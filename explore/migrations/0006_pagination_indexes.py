@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('explore', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culture',
+            index=models.Index(fields=['created_at', 'id'], name='culture_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['created_at', 'id'], name='destination_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('explore', '0007_contentversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentversion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('explore', '0009_favorite_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized/re-encoded copies of image, kept in sync by explore.images'),
+        ),
+        migrations.AddField(
+            model_name='culture',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized/re-encoded copies of image, kept in sync by explore.images'),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized/re-encoded copies of image, kept in sync by explore.images'),
+        ),
+    ]
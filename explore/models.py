@@ -14,20 +14,28 @@ class Category(models.Model):
 class Destination(models.Model):
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='destinations/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized/re-encoded copies of image, kept in sync by explore.images")
     categories = models.ManyToManyField(Category, related_name='destinations')
     short_description = models.TextField()
     long_description = models.TextField()
     location_name = models.CharField(max_length=200, blank=True, null=True, help_text="Physical location name, different from map link")
     maps_link = models.URLField(blank=True, null=True)
+    category_snapshot = models.JSONField(default=list, blank=True, editable=False, help_text="Denormalized [{id, name}] copy of categories, kept in sync by signals")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.title
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='destination_created_id_idx'),
+        ]
 
 class Activity(models.Model):
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='activities/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized/re-encoded copies of image, kept in sync by explore.images")
     short_description = models.TextField()
     long_description = models.TextField()
     tips = models.TextField()
@@ -40,10 +48,14 @@ class Activity(models.Model):
     
     class Meta:
         verbose_name_plural = 'Activities'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+        ]
 
 class Culture(models.Model):
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='culture/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized/re-encoded copies of image, kept in sync by explore.images")
     short_description = models.TextField()
     long_description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -51,6 +63,11 @@ class Culture(models.Model):
     
     def __str__(self):
         return self.title
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='culture_created_id_idx'),
+        ]
 
 class Favorite(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='favorites')
@@ -87,3 +104,15 @@ class Favorite(models.Model):
                 condition=models.Q(culture__isnull=False)
             ),
         ]
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='favorite_user_created_idx'),
+        ]
+
+class ContentVersion(models.Model):
+    # Per-model counter bumped on every content change; keys the response cache
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.key} v{self.version}"
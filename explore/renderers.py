@@ -0,0 +1,5 @@
+from backend.renderers import ORJSONRenderer
+
+class FavoriteIdsRenderer(ORJSONRenderer):
+    # Selected with ?format=ids; the favorites list then returns bare item ids
+    format = 'ids'
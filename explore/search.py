@@ -0,0 +1,218 @@
+"""
+Full-text search index for content models.
+
+Each registered model gets a side table holding a weighted document per row:
+a `tsvector` column with a GIN index on Postgres, or an FTS5 virtual table
+(porter stemming) on SQLite. Rows are kept up to date by post_save/post_delete
+signals, and `search()` returns querysets ordered by relevance. The relevance
+is a `search_score` annotation computed in SQL, so KeysetPagination pages
+through every match on (search_score, pk).
+"""
+import re
+from dataclasses import dataclass
+from django.db import connection, transaction
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+
+@dataclass(frozen=True)
+class SearchSpec:
+    kind: str
+    model: type
+    title: tuple
+    summary: tuple
+    body: tuple
+
+    @property
+    def table(self):
+        return f'explore_search_{self.kind}'
+
+    @property
+    def fields(self):
+        return self.title + self.summary + self.body
+
+    def document(self, obj):
+        # (title, summary, body) text, weighted A/B/C when ranking
+        return tuple(
+            ' '.join(getattr(obj, field) or '' for field in fields)
+            for fields in (self.title, self.summary, self.body)
+        )
+
+_registry = {}
+
+def register(kind, model, title, summary=(), body=()):
+    spec = SearchSpec(kind, model, tuple(title), tuple(summary), tuple(body))
+    _registry[kind] = spec
+    post_save.connect(_index_saved, sender=model, dispatch_uid=f'search-index-{kind}')
+    post_delete.connect(_index_deleted, sender=model, dispatch_uid=f'search-unindex-{kind}')
+    return spec
+
+def registered_kinds():
+    return list(_registry)
+
+def get_spec(kind):
+    return _registry[kind]
+
+def spec_for_model(model):
+    for spec in _registry.values():
+        if spec.model is model:
+            return spec
+    return None
+
+def is_supported():
+    return connection.vendor in ('postgresql', 'sqlite')
+
+def _terms(query):
+    # Plain word tokens only; anything else would be query syntax for the backend
+    return re.findall(r'[^\W_]+', query.lower())[:10]
+
+# Schema, used by the migrations that create the index tables
+
+def create_table(schema_editor, table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {table}_document ON {table} USING GIN (document)')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5(title, summary, body, tokenize='porter unicode61')"
+        )
+
+def drop_table(schema_editor, table):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+# Index maintenance
+
+def index_objects(spec, objects):
+    if not is_supported():
+        return
+    rows = [(obj.pk, *spec.document(obj)) for obj in objects]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(
+                f"""INSERT INTO {spec.table} (object_id, document) VALUES (%s,
+                    setweight(to_tsvector('english', %s), 'A') ||
+                    setweight(to_tsvector('english', %s), 'B') ||
+                    setweight(to_tsvector('english', %s), 'C'))
+                ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document""",
+                rows,
+            )
+        else:
+            # FTS5 rowid doubles as the object id
+            cursor.executemany(f'DELETE FROM {spec.table} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {spec.table} (rowid, title, summary, body) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+def unindex_objects(spec, pks):
+    if not is_supported():
+        return
+    column = 'object_id' if connection.vendor == 'postgresql' else 'rowid'
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {spec.table} WHERE {column} = %s', [(pk,) for pk in pks])
+
+def rebuild(spec, queryset=None, batch_size=500):
+    if not is_supported():
+        return 0
+    queryset = spec.model.objects.all() if queryset is None else queryset
+    batch = []
+    count = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {spec.table}')
+        for obj in queryset.only('pk', *spec.fields).iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                index_objects(spec, batch)
+                count += len(batch)
+                batch = []
+        index_objects(spec, batch)
+    return count + len(batch)
+
+def _index_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_objects(spec_for_model(sender), [instance])
+
+def _index_deleted(sender, instance, **kwargs):
+    unindex_objects(spec_for_model(sender), [instance.pk])
+
+# Querying
+
+def _match_query(terms):
+    # Every term, as a prefix
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _ranked_select(spec, terms, limit):
+    # One ranked SELECT of (kind, pk, score) against a kind's index table
+    if connection.vendor == 'postgresql':
+        sql = f"""SELECT %s, object_id, ts_rank(document, tsq) AS score
+            FROM {spec.table}, to_tsquery('english', %s) tsq
+            WHERE document @@ tsq
+            ORDER BY score DESC, object_id LIMIT %s"""
+    else:
+        sql = f"""SELECT %s, rowid, -bm25({spec.table}, 10.0, 4.0, 1.0) AS score
+            FROM {spec.table} WHERE {spec.table} MATCH %s
+            ORDER BY score DESC, rowid LIMIT %s"""
+    return sql, [spec.kind, _match_query(terms), limit]
+
+def _matches_sql(spec):
+    # Ids of the rows matching the query
+    if connection.vendor == 'postgresql':
+        return f"SELECT object_id FROM {spec.table} WHERE document @@ to_tsquery('english', %s)"
+    return f'SELECT rowid FROM {spec.table} WHERE {spec.table} MATCH %s'
+
+def _score_sql(spec):
+    # Relevance of the outer query's row; higher scores rank higher
+    qn = connection.ops.quote_name
+    outer = f'{qn(spec.model._meta.db_table)}.{qn(spec.model._meta.pk.column)}'
+    if connection.vendor == 'postgresql':
+        # float8, so the score round-trips exactly through pagination cursors
+        return f"""SELECT CAST(ts_rank(document, to_tsquery('english', %s)) AS double precision)
+            FROM {spec.table} WHERE object_id = {outer}"""
+    return f"""SELECT -bm25({spec.table}, 10.0, 4.0, 1.0)
+        FROM {spec.table} WHERE {spec.table} MATCH %s AND rowid = {outer}"""
+
+def ranked_hits(kinds, query, limit_per_kind):
+    """Search several kinds in one statement.
+
+    Returns ``[(kind, pk, score), ...]`` merged across kinds, best match first,
+    with at most ``limit_per_kind`` hits per kind.
+    """
+    terms = _terms(query)
+    if not terms or not kinds:
+        return []
+    selects = [_ranked_select(get_spec(kind), terms, limit_per_kind) for kind in kinds]
+    sql = ' UNION ALL '.join(f'SELECT * FROM ({select}) AS hits_{index}' for index, (select, params) in enumerate(selects))
+    params = [param for select, select_params in selects for param in select_params]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+    return sorted(hits, key=lambda hit: -hit[2])
+
+def search(queryset, kind, query):
+    """Filter ``queryset`` to rows matching ``query``, ordered by relevance."""
+    spec = get_spec(kind)
+    if not is_supported():
+        # No index on this backend; keep the old substring match
+        condition = Q()
+        for field in spec.fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+    match = _match_query(terms)
+    return (
+        queryset.filter(pk__in=RawSQL(_matches_sql(spec), [match]))
+        .annotate(search_score=RawSQL(_score_sql(spec), [match], output_field=FloatField()))
+        .order_by('-search_score', 'pk')
+    )
@@ -1,13 +1,52 @@
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
+from backend.fieldsets import SparseFieldsSerializerMixin
+from .images import ImageVariantsSerializerMixin
 from .models import Category, Destination, Activity, Culture, Favorite
 
+def load_favorite_ids(context, field, item_ids):
+    """Load which of ``item_ids`` the requesting user has favorited, in one query.
+
+    The result is stored on the shared serializer context under
+    ``favorite_ids[field]`` so every nested serializer can read it.
+    """
+    request = context.get('request')
+    if not (request and request.user.is_authenticated):
+        return
+    favorite_ids = Favorite.objects.filter(
+        user=request.user, **{f'{field}_id__in': item_ids}
+    ).values_list(f'{field}_id', flat=True)
+    context.setdefault('favorite_ids', {})[field] = set(favorite_ids)
+
+class FavoriteListSerializer(serializers.ListSerializer):
+    # Resolves `is_favorite` for every item on the page up front instead of per row
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        load_favorite_ids(self.context, self.child.favorite_field, [item.pk for item in items])
+        return super().to_representation(items)
+
+class FavoriteStatusMixin:
+    favorite_field = None
+    
+    def get_is_favorite(self, obj):
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return False
+        favorite_ids = self.context.get('favorite_ids', {}).get(self.favorite_field)
+        if favorite_ids is not None:
+            return obj.pk in favorite_ids
+        # Single item (e.g. retrieve) with nothing preloaded
+        return Favorite.objects.filter(user=request.user, **{self.favorite_field: obj}).exists()
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name']
 
-class DestinationSerializer(serializers.ModelSerializer):
-    categories = CategorySerializer(many=True, read_only=True)
+class DestinationSerializer(SparseFieldsSerializerMixin, FavoriteStatusMixin, ImageVariantsSerializerMixin, serializers.ModelSerializer):
+    favorite_field = 'destination'
+    categories = serializers.SerializerMethodField()
     category_ids = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         many=True,
@@ -19,42 +58,53 @@ class DestinationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Destination
-        fields = ['id', 'title', 'image', 'categories', 'category_ids', 'short_description', 
+        list_serializer_class = FavoriteListSerializer
+        fields = ['id', 'title', 'image', 'image_variants', 'srcset', 'categories', 'category_ids', 'short_description', 
                   'long_description', 'location_name', 'maps_link', 'created_at', 'updated_at', 'is_favorite']
+        card_fields = ['id', 'title', 'image', 'srcset', 'categories', 'short_description', 'location_name', 'is_favorite']
+        field_columns = {'categories': ['category_snapshot'], 'srcset': ['image_variants']}
     
-    def get_is_favorite(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorite.objects.filter(user=request.user, destination=obj).exists()
-        return False
+    def get_categories(self, obj):
+        if settings.DESTINATION_CATEGORY_SNAPSHOT:
+            return obj.category_snapshot
+        return CategorySerializer(obj.categories.all(), many=True).data
+
+    def create(self, validated_data):
+        return self._refresh_category_snapshot(super().create(validated_data))
+
+    def update(self, instance, validated_data):
+        return self._refresh_category_snapshot(super().update(instance, validated_data))
 
-class ActivitySerializer(serializers.ModelSerializer):
+    def _refresh_category_snapshot(self, instance):
+        # The m2m_changed handler writes the snapshot straight to the database,
+        # so the in-memory instance still holds the old value
+        if settings.DESTINATION_CATEGORY_SNAPSHOT:
+            instance.refresh_from_db(fields=['category_snapshot', 'updated_at'])
+        return instance
+
+class ActivitySerializer(SparseFieldsSerializerMixin, FavoriteStatusMixin, ImageVariantsSerializerMixin, serializers.ModelSerializer):
+    favorite_field = 'activity'
     is_favorite = serializers.SerializerMethodField()
     
     class Meta:
         model = Activity
-        fields = ['id', 'title', 'image', 'short_description', 'long_description', 
+        list_serializer_class = FavoriteListSerializer
+        fields = ['id', 'title', 'image', 'image_variants', 'srcset', 'short_description', 'long_description', 
                   'tips', 'duration', 'created_at', 'updated_at', 'is_favorite']
-    
-    def get_is_favorite(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorite.objects.filter(user=request.user, activity=obj).exists()
-        return False
+        card_fields = ['id', 'title', 'image', 'srcset', 'short_description', 'duration', 'is_favorite']
+        field_columns = {'srcset': ['image_variants']}
 
-class CultureSerializer(serializers.ModelSerializer):
+class CultureSerializer(SparseFieldsSerializerMixin, FavoriteStatusMixin, ImageVariantsSerializerMixin, serializers.ModelSerializer):
+    favorite_field = 'culture'
     is_favorite = serializers.SerializerMethodField()
     
     class Meta:
         model = Culture
-        fields = ['id', 'title', 'image', 'short_description', 'long_description', 
+        list_serializer_class = FavoriteListSerializer
+        fields = ['id', 'title', 'image', 'image_variants', 'srcset', 'short_description', 'long_description', 
                   'created_at', 'updated_at', 'is_favorite']
-    
-    def get_is_favorite(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Favorite.objects.filter(user=request.user, culture=obj).exists()
-        return False
+        card_fields = ['id', 'title', 'image', 'srcset', 'short_description', 'is_favorite']
+        field_columns = {'srcset': ['image_variants']}
 
 class FavoriteSerializer(serializers.ModelSerializer):
     destination_details = DestinationSerializer(source='destination', read_only=True)
@@ -67,8 +117,28 @@ class FavoriteSerializer(serializers.ModelSerializer):
                  'destination_details', 'activity_details', 'culture_details']
         read_only_fields = ['user']
     
+    def to_representation(self, instance):
+        # The nested item is one of the requesting user's favorites by definition,
+        # so record it instead of letting `is_favorite` query for it again
+        request = self.context.get('request')
+        if request and request.user.is_authenticated and instance.user_id == request.user.pk:
+            favorite_ids = self.context.setdefault('favorite_ids', {})
+            for field in ['destination', 'activity', 'culture']:
+                item_id = getattr(instance, f'{field}_id')
+                if item_id is not None:
+                    favorite_ids.setdefault(field, set()).add(item_id)
+        return super().to_representation(instance)
+    
     def validate(self, data):
         # Ensure at least one item type is provided
         if not any(data.get(field) for field in ['destination', 'activity', 'culture']):
             raise serializers.ValidationError("At least one of destination, activity, or culture must be provided.")
         return data
+
+class FavoriteOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'remove'])
+    item_type = serializers.ChoiceField(choices=['destination', 'activity', 'culture'])
+    item_id = serializers.IntegerField(min_value=1)
+
+class FavoriteSyncSerializer(serializers.Serializer):
+    operations = FavoriteOperationSerializer(many=True, allow_empty=False, max_length=500)
@@ -0,0 +1,56 @@
+from django.db.models.signals import m2m_changed, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Category, Destination
+
+def refresh_category_snapshots(destination_ids):
+    """Rebuild `Destination.category_snapshot` for the given destinations."""
+    destination_ids = set(destination_ids)
+    if not destination_ids:
+        return
+    snapshots = {destination_id: [] for destination_id in destination_ids}
+    links = (
+        Destination.categories.through.objects
+        .filter(destination_id__in=destination_ids)
+        .order_by('category_id')
+        .values_list('destination_id', 'category_id', 'category__name')
+    )
+    for destination_id, category_id, name in links:
+        snapshots[destination_id].append({'id': category_id, 'name': name})
+    
+    now = timezone.now()
+    destinations = [
+        Destination(pk=destination_id, category_snapshot=snapshot, updated_at=now)
+        for destination_id, snapshot in snapshots.items()
+    ]
+    Destination.objects.bulk_update(destinations, ['category_snapshot', 'updated_at'])
+
+@receiver(m2m_changed, sender=Destination.categories.through)
+def destination_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            refresh_category_snapshots([instance.pk])
+        return
+    # category.destinations.add()/remove()/clear() touches many destinations
+    if action == 'pre_clear':
+        instance._cleared_destination_ids = list(instance.destinations.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_category_snapshots(getattr(instance, '_cleared_destination_ids', []))
+    else:
+        refresh_category_snapshots(pk_set or [])
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_category_snapshots(instance.destinations.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    # The M2M rows are removed by cascade without an m2m_changed signal
+    instance._deleted_destination_ids = list(instance.destinations.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    refresh_category_snapshots(getattr(instance, '_deleted_destination_ids', []))
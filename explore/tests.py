@@ -1,3 +1,301 @@
+import datetime
+from base64 import b64encode
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import Activity, Category, Destination, Favorite
+from .serializers import DestinationSerializer
 
 # Create your tests here.
+
+class DestinationCategorySnapshotTests(TestCase):
+    def setUp(self):
+        self.beach = Category.objects.create(name='Beach')
+        # Variants marked current, so saving doesn't regenerate them
+        self.destination = Destination.objects.create(
+            title='Pacifico Beach', image='destinations/pacifico-beach.jpg',
+            image_variants={'source': 'destinations/pacifico-beach.jpg', 'variants': {}},
+            short_description='Short', long_description='Long',
+        )
+
+    def test_update_returns_fresh_snapshot(self):
+        serializer = DestinationSerializer(self.destination, data={'category_ids': [self.beach.pk]}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(serializer.data['categories'], [{'id': self.beach.pk, 'name': 'Beach'}])
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        # Cached responses outlive the content versions rolled back after each test
+        cache.clear()
+        # bulk_create skips the image variant signal
+        Destination.objects.bulk_create([
+            Destination(title=f'Destination {index}', image='destinations/pacifico-beach.jpg',
+                        short_description='Short', long_description='Long')
+            for index in range(3)
+        ])
+
+    def test_sparse_list_loads_cursor_column(self):
+        # Content versions and the page; building the next cursor mustn't load created_at row by row
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/explore/destinations/', {'fields': 'title', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+        self.assertIsNotNone(response.json()['next'])
+
+class FavoriteQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('reader')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        category = Category.objects.create(name='Beaches')
+        destinations = Destination.objects.bulk_create([
+            Destination(title=f'Destination {index}', image='destinations/pacifico-beach.jpg',
+                        short_description='Short', long_description='Long')
+            for index in range(40)
+        ])
+        for destination in destinations:
+            destination.categories.add(category)
+        self.favorite_ids = {destination.pk for destination in destinations[::3]}
+        Favorite.objects.bulk_create([Favorite(user=user, destination_id=pk) for pk in self.favorite_ids])
+
+    def assert_page_queries(self, count, page_size):
+        # Versions (content and the user's favorites), the page, and the page's favorites
+        with self.assertNumQueries(count):
+            response = self.client.get('/api/explore/destinations/', {'page_size': page_size})
+        results = response.json()['results']
+        self.assertEqual(len(results), page_size)
+        for item in results:
+            self.assertEqual(item['is_favorite'], item['id'] in self.favorite_ids)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        for page_size in (5, 30):
+            with self.subTest(page_size=page_size):
+                self.assert_page_queries(3, page_size)
+
+    def test_prefetched_categories(self):
+        with self.settings(DESTINATION_CATEGORY_SNAPSHOT=False):
+            for page_size in (5, 30):
+                with self.subTest(page_size=page_size):
+                    self.assert_page_queries(4, page_size)
+
+class KeysetPaginationTests(TestCase):
+    url = '/api/explore/destinations/'
+
+    def setUp(self):
+        cache.clear()
+        # Two pairs share a created_at, so only the id breaks the tie
+        base = timezone.now()
+        offsets = [0, 1, 1, 2, 2, 3, 4]
+        destinations = Destination.objects.bulk_create([
+            Destination(title=f'Destination {index}', image='destinations/pacifico-beach.jpg',
+                        short_description='Short', long_description='Long')
+            for index in range(len(offsets))
+        ])
+        for destination, offset in zip(destinations, offsets):
+            destination.created_at = base - datetime.timedelta(minutes=offset)
+        Destination.objects.bulk_update(destinations, ['created_at'])
+        # Newest first, then highest id first among equal timestamps
+        self.expected = [d.pk for d in sorted(destinations, key=lambda d: (d.created_at, d.pk), reverse=True)]
+
+    def get_page(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = []
+        page = self.get_page(self.url, page_size=2)
+        self.assertIsNone(page['previous'])
+        while True:
+            seen += [item['id'] for item in page['results']]
+            if not page['next']:
+                break
+            page = self.get_page(page['next'])
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.get_page(self.url, page_size=2)
+        second = self.get_page(first['next'])
+        third = self.get_page(second['next'])
+        self.assertEqual([item['id'] for item in self.get_page(third['previous'])['results']], self.expected[2:4])
+        back = self.get_page(second['previous'])
+        self.assertEqual([item['id'] for item in back['results']], self.expected[:2])
+        self.assertIsNone(back['previous'])
+        self.assertIsNotNone(back['next'])
+
+    def test_deep_page_seeks_the_index(self):
+        first = self.get_page(self.url, page_size=2)
+        second = self.get_page(first['next'])
+        with CaptureQueriesContext(connection) as queries:
+            self.get_page(second['next'])
+        [sql] = [query['sql'] for query in queries if 'FROM "explore_destination"' in query['sql']]
+        self.assertIn('"explore_destination"."created_at" <=', sql)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('SEARCH explore_destination USING INDEX destination_created_id_idx', plan)
+
+    def test_invalid_cursor(self):
+        for cursor in ['not base64!', b64encode(b'p=2024-01-01').decode(), b64encode(b'p=yesterday&i=1').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+class SearchPaginationTests(TestCase):
+    url = '/api/explore/destinations/'
+
+    def setUp(self):
+        cache.clear()
+        # Matches in the title rank above matches in the descriptions only
+        self.title_matches = [
+            self.create(f'Lagoon {index}', 'Short', 'Long') for index in range(3)
+        ]
+        self.body_matches = [
+            self.create(f'Spot {index}', 'Short', f'A quiet lagoon {index}') for index in range(4)
+        ]
+        self.create('Cloud 9', 'Surf', 'Waves')
+
+    def create(self, title, short_description, long_description):
+        # Variants marked current, so saving doesn't generate them
+        return Destination.objects.create(
+            title=title, image='destinations/pacifico-beach.jpg',
+            image_variants={'source': 'destinations/pacifico-beach.jpg', 'variants': {}},
+            short_description=short_description, long_description=long_description,
+        )
+
+    def test_pages_through_every_match_by_rank(self):
+        seen = []
+        response = self.client.get(self.url, {'search': 'lagoon', 'page_size': 2, 'fields': 'title'})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen += [item['id'] for item in page['results']]
+            if not page['next']:
+                break
+            response = self.client.get(page['next'])
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen[:3]), {d.pk for d in self.title_matches})
+        self.assertEqual(set(seen[3:]), {d.pk for d in self.body_matches})
+
+    def test_score_is_paginated_in_sql(self):
+        first = self.client.get(self.url, {'search': 'lagoon', 'page_size': 2}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        [sql] = [query['sql'] for query in queries if 'FROM "explore_destination"' in query['sql']]
+        self.assertIn('AS "search_score"', sql)
+        self.assertIn('LIMIT 3', sql)
+
+class FavoriteToggleTests(TestCase):
+    url = '/api/explore/favorites/toggle/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # bulk_create skips the image variant signal
+        [self.activity] = Activity.objects.bulk_create([Activity(
+            title='Surfing', image='activities/surfing.webp', short_description='Short',
+            long_description='Long', tips='Wax your board',
+        )])
+
+    def toggle(self, item_id):
+        return self.client.post(self.url, {'item_type': 'activity', 'item_id': item_id}, format='json')
+
+    def test_toggle_adds_then_removes(self):
+        response = self.toggle(self.activity.pk)
+        self.assertEqual((response.status_code, response.json()), (201, {'status': 'added'}))
+        self.assertTrue(Favorite.objects.filter(user=self.user, activity=self.activity).exists())
+        response = self.toggle(self.activity.pk)
+        self.assertEqual((response.status_code, response.json()), (200, {'status': 'removed'}))
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_missing_item(self):
+        # Runs inside the test's transaction, where a foreign key error would only surface at commit
+        response = self.toggle(self.activity.pk + 100)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_concurrent_add(self):
+        # Another request's INSERT lands between this request's DELETE and INSERT
+        Favorite.objects.create(user=self.user, activity=self.activity)
+        with mock.patch('django.db.models.query.QuerySet.delete', return_value=(0, {})):
+            response = self.toggle(self.activity.pk)
+        self.assertEqual((response.status_code, response.json()), (201, {'status': 'added'}))
+        self.assertEqual(Favorite.objects.filter(user=self.user, activity=self.activity).count(), 1)
+
+    def test_sync(self):
+        [other] = Activity.objects.bulk_create([Activity(
+            title='Kayaking', image='activities/kayaking.webp', short_description='Short',
+            long_description='Long', tips='Bring water',
+        )])
+        Favorite.objects.create(user=self.user, activity=other)
+        response = self.client.post('/api/explore/favorites/sync/', {'operations': [
+            {'op': 'add', 'item_type': 'activity', 'item_id': self.activity.pk},
+            {'op': 'remove', 'item_type': 'activity', 'item_id': self.activity.pk},
+            # The last operation on an item wins
+            {'op': 'add', 'item_type': 'activity', 'item_id': self.activity.pk},
+            {'op': 'remove', 'item_type': 'activity', 'item_id': other.pk},
+            {'op': 'add', 'item_type': 'destination', 'item_id': 999},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'removed': 1, 'favorited': 1, 'missing': [{'item_type': 'destination', 'item_id': 999}],
+        })
+        self.assertEqual(list(Favorite.objects.values_list('activity_id', flat=True)), [self.activity.pk])
+
+class FavoriteETagTests(TestCase):
+    url = '/api/explore/activities/'
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user('reader')
+        self.other = User.objects.create_user('other')
+        # bulk_create skips the image variant signal
+        self.first, self.second, self.third = Activity.objects.bulk_create([
+            Activity(title=title, image='activities/surfing.webp', short_description='Short',
+                     long_description='Long', tips='Tips')
+            for title in ('Surfing', 'Kayaking', 'Diving')
+        ])
+        Favorite.objects.create(pk=10, user=self.reader, activity=self.first)
+        Favorite.objects.create(pk=20, user=self.reader, activity=self.third)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def etag(self, client):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_swapping_a_favorite_changes_only_that_users_etag(self):
+        reader, other = self.client_for(self.reader), self.client_for(self.other)
+        reader_etag, other_etag = self.etag(reader), self.etag(other)
+        self.assertEqual(reader.get(self.url, HTTP_IF_NONE_MATCH=reader_etag).status_code, 304)
+
+        # Same number of favorites and the same highest id as before
+        Favorite.objects.filter(pk=10).delete()
+        Favorite.objects.create(pk=11, user=self.reader, activity=self.second)
+
+        response = reader.get(self.url, HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+        favorites = {item['id']: item['is_favorite'] for item in response.json()['results']}
+        self.assertEqual(favorites, {self.first.pk: False, self.second.pk: True, self.third.pk: True})
+        self.assertEqual(other.get(self.url, HTTP_IF_NONE_MATCH=other_etag).status_code, 304)
+
+    def test_sync_changes_the_etag(self):
+        reader = self.client_for(self.reader)
+        etag = self.etag(reader)
+        reader.post('/api/explore/favorites/sync/', {'operations': [
+            {'op': 'add', 'item_type': 'activity', 'item_id': self.second.pk},
+        ]}, format='json')
+        self.assertEqual(reader.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
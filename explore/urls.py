@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, DestinationViewSet, ActivityViewSet, CultureViewSet, FavoriteViewSet
+from .views import CategoryViewSet, DestinationViewSet, ActivityViewSet, CultureViewSet, FavoriteViewSet, UnifiedSearchView, ResponseCacheStatsView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -10,5 +10,7 @@ router.register(r'cultures', CultureViewSet)
 router.register(r'favorites', FavoriteViewSet, basename='favorite')
 
 urlpatterns = [
+    path('search/', UnifiedSearchView.as_view(), name='unified_search'),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='response_cache_stats'),
     path('', include(router.urls)),
 ]
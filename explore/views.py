@@ -1,29 +1,47 @@
 from django.shortcuts import render
 from rest_framework import viewsets, generics, permissions
 from rest_framework import viewsets, permissions, status
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
 from .models import Category, Destination, Activity, Culture, Favorite
-from .serializers import CategorySerializer, DestinationSerializer, ActivitySerializer, CultureSerializer, FavoriteSerializer
-from django.db.models import Q
+from .serializers import CategorySerializer, DestinationSerializer, ActivitySerializer, CultureSerializer, FavoriteSerializer, FavoriteSyncSerializer
+from . import caching, search
+from .renderers import FavoriteIdsRenderer
+from .caching import CachedContentMixin, cached_content
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from backend.fieldsets import SparseFieldsViewMixin
+from events.views import EventViewSet
 
 # Create your views here.
 
-class CategoryViewSet(viewsets.ModelViewSet):
+FAVORITE_MODELS = {
+    'destination': Destination,
+    'activity': Activity,
+    'culture': Culture,
+}
+
+class CategoryViewSet(CachedContentMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = None  # Small lookup table, always returned whole
+    cache_dependencies = ('explore.category',)
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.AllowAny()]
         return super().get_permissions()
 
-class DestinationViewSet(viewsets.ModelViewSet):
+class DestinationViewSet(CachedContentMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Destination.objects.all()
     serializer_class = DestinationSerializer
     permission_classes = [permissions.IsAdminUser]
+    cache_dependencies = ('explore.destination', 'explore.category')
+    vary_on_favorites = True
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -36,29 +54,37 @@ class DestinationViewSet(viewsets.ModelViewSet):
         return context
     
     @action(detail=False, methods=['get'])
+    @cached_content
     def by_category(self, request):
         category_id = request.query_params.get('category_id')
         if category_id:
-            destinations = Destination.objects.filter(categories__id=category_id)
+            destinations = self.filter_queryset(self.get_base_queryset().filter(categories__id=category_id))
+            page = self.paginate_queryset(destinations)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
             serializer = self.get_serializer(destinations, many=True)
             return Response(serializer.data)
         return Response({'error': 'Category ID is required'}, status=400)
     
-    def get_queryset(self):
+    def get_base_queryset(self):
         queryset = Destination.objects.all()
+        if not settings.DESTINATION_CATEGORY_SNAPSHOT:
+            queryset = queryset.prefetch_related('categories')
+        return queryset
+    
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
         search_query = self.request.query_params.get('search', None)
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(short_description__icontains=search_query) |
-                Q(long_description__icontains=search_query)
-            )
+            queryset = search.search(queryset, 'destination', search_query)
         return queryset
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(CachedContentMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
     permission_classes = [permissions.IsAdminUser]
+    cache_dependencies = ('explore.activity',)
+    vary_on_favorites = True
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -70,22 +96,22 @@ class ActivityViewSet(viewsets.ModelViewSet):
         context.update({"request": self.request})
         return context
     
+    def get_base_queryset(self):
+        return Activity.objects.all()
+    
     def get_queryset(self):
-        queryset = Activity.objects.all()
+        queryset = self.get_base_queryset()
         search_query = self.request.query_params.get('search', None)
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(short_description__icontains=search_query) |
-                Q(long_description__icontains=search_query) |
-                Q(tips__icontains=search_query)
-            )
+            queryset = search.search(queryset, 'activity', search_query)
         return queryset
 
-class CultureViewSet(viewsets.ModelViewSet):
+class CultureViewSet(CachedContentMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Culture.objects.all()
     serializer_class = CultureSerializer
     permission_classes = [permissions.IsAdminUser]
+    cache_dependencies = ('explore.culture',)
+    vary_on_favorites = True
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -97,23 +123,40 @@ class CultureViewSet(viewsets.ModelViewSet):
         context.update({"request": self.request})
         return context
     
+    def get_base_queryset(self):
+        return Culture.objects.all()
+    
     def get_queryset(self):
-        queryset = Culture.objects.all()
+        queryset = self.get_base_queryset()
         search_query = self.request.query_params.get('search', None)
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(short_description__icontains=search_query) |
-                Q(long_description__icontains=search_query)
-            )
+            queryset = search.search(queryset, 'culture', search_query)
         return queryset
 
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, FavoriteIdsRenderer]
     
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user)
+        queryset = Favorite.objects.filter(user=self.request.user).select_related('destination', 'activity', 'culture')
+        if not settings.DESTINATION_CATEGORY_SNAPSHOT:
+            queryset = queryset.prefetch_related('destination__categories')
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'ids':
+            # Compact mode: every favorited item id, grouped by type, from one query
+            ids = {item_type: [] for item_type in FAVORITE_MODELS}
+            rows = Favorite.objects.filter(user=request.user).order_by('-created_at', '-id').values_list(
+                'destination_id', 'activity_id', 'culture_id'
+            )
+            for row in rows:
+                for item_type, item_id in zip(FAVORITE_MODELS, row):
+                    if item_id is not None:
+                        ids[item_type].append(item_id)
+            return Response(ids)
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -130,46 +173,154 @@ class FavoriteViewSet(viewsets.ModelViewSet):
             )
         
         # Validate item_type
-        if item_type not in ['destination', 'activity', 'culture']:
+        if item_type not in FAVORITE_MODELS:
             return Response(
                 {"error": "item_type must be one of: destination, activity, culture"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if the item exists
         try:
-            if item_type == 'destination':
-                item = Destination.objects.get(id=item_id)
-                existing = Favorite.objects.filter(user=request.user, destination=item).first()
-                if existing:
-                    existing.delete()
-                    return Response({"status": "removed"}, status=status.HTTP_200_OK)
-                else:
-                    Favorite.objects.create(user=request.user, destination=item)
-                    return Response({"status": "added"}, status=status.HTTP_201_CREATED)
-            
-            elif item_type == 'activity':
-                item = Activity.objects.get(id=item_id)
-                existing = Favorite.objects.filter(user=request.user, activity=item).first()
-                if existing:
-                    existing.delete()
-                    return Response({"status": "removed"}, status=status.HTTP_200_OK)
-                else:
-                    Favorite.objects.create(user=request.user, activity=item)
-                    return Response({"status": "added"}, status=status.HTTP_201_CREATED)
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return Response({"error": "item_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Delete-or-insert: a single DELETE when the item is already a favorite,
+        # otherwise one INSERT guarded by the unique constraints
+        deleted, _ = Favorite.objects.filter(user=request.user, **{f'{item_type}_id': item_id}).delete()
+        if deleted:
+            return Response({"status": "removed"}, status=status.HTTP_200_OK)
+        
+        with transaction.atomic():
+            # Checked explicitly: foreign keys may only be enforced at the outermost commit.
+            # The row lock keeps the item from being deleted before the favorite commits.
+            if not FAVORITE_MODELS[item_type].objects.select_for_update().filter(pk=item_id).exists():
+                return Response(
+                    {"error": f"{item_type} with id {item_id} does not exist"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            try:
+                with transaction.atomic():
+                    Favorite.objects.create(user=request.user, **{f'{item_type}_id': item_id})
+            except IntegrityError:
+                # A concurrent request (e.g. a double tap) added it first
+                pass
+        return Response({"status": "added"}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        serializer = FavoriteSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Later operations on the same item win
+        final_ops = {}
+        for operation in serializer.validated_data['operations']:
+            final_ops[(operation['item_type'], operation['item_id'])] = operation['op']
+        
+        removals = Q()
+        additions = {item_type: set() for item_type in FAVORITE_MODELS}
+        for (item_type, item_id), op in final_ops.items():
+            if op == 'remove':
+                removals |= Q(**{f'{item_type}_id': item_id})
+            else:
+                additions[item_type].add(item_id)
+        
+        with transaction.atomic():
+            removed = 0
+            if removals:
+                removed, _ = Favorite.objects.filter(removals, user=request.user).delete()
             
-            elif item_type == 'culture':
-                item = Culture.objects.get(id=item_id)
-                existing = Favorite.objects.filter(user=request.user, culture=item).first()
-                if existing:
-                    existing.delete()
-                    return Response({"status": "removed"}, status=status.HTTP_200_OK)
-                else:
-                    Favorite.objects.create(user=request.user, culture=item)
-                    return Response({"status": "added"}, status=status.HTTP_201_CREATED)
-        
-        except (Destination.DoesNotExist, Activity.DoesNotExist, Culture.DoesNotExist):
-            return Response(
-                {"error": f"{item_type} with id {item_id} does not exist"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+            favorites = []
+            missing = []
+            for item_type, item_ids in additions.items():
+                if not item_ids:
+                    continue
+                existing = set(FAVORITE_MODELS[item_type].objects.filter(pk__in=item_ids).values_list('pk', flat=True))
+                favorites += [Favorite(user=request.user, **{f'{item_type}_id': item_id}) for item_id in existing]
+                missing += [{'item_type': item_type, 'item_id': item_id} for item_id in sorted(item_ids - existing)]
+            # Items that are already favorites are skipped by the unique constraints
+            Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+            if favorites:
+                # bulk_create sends no signals
+                caching.bump_favorites(request.user.pk)
+        
+        return Response({
+            'removed': removed,
+            # Items now favorited, whether newly added or already present
+            'favorited': len(favorites),
+            'missing': missing,
+        }, status=status.HTTP_200_OK)
+
+class UnifiedSearchView(APIView):
+    """Search destinations, activities, cultures and events in one request.
+
+    Hits from every content type are ranked together; each type contributes at
+    most `limit` results and items are serialized the same way as on the
+    corresponding list endpoint.
+    """
+    permission_classes = [permissions.AllowAny]
+    search_viewsets = {
+        'destination': DestinationViewSet,
+        'activity': ActivityViewSet,
+        'culture': CultureViewSet,
+        'event': EventViewSet,
+    }
+    default_limit = 5
+    max_limit = 20
+    cache_dependencies = ('explore.destination', 'explore.category', 'explore.activity', 'explore.culture', 'events.event')
+    vary_on_favorites = True
+    
+    @cached_content
+    def get(self, request):
+        query = request.query_params.get('search') or request.query_params.get('q')
+        if not query:
+            return Response({'error': 'Search parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        kinds = list(self.search_viewsets)
+        requested_types = request.query_params.get('types')
+        if requested_types:
+            kinds = [kind for kind in requested_types.split(',') if kind in self.search_viewsets]
+        
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        limit = max(limit, 1)
+        
+        viewsets_by_kind = {
+            kind: self.search_viewsets[kind](request=request, format_kwarg=None, action='list', kwargs={})
+            for kind in kinds
+        }
+        
+        if search.is_supported():
+            hits = search.ranked_hits(kinds, query, limit)
+        else:
+            # No full-text index on this backend: fall back to each type's own filtering
+            hits = []
+            for kind, viewset in viewsets_by_kind.items():
+                matches = search.search(viewset.get_base_queryset(), kind, query).values_list('pk', flat=True)[:limit]
+                hits.extend((kind, pk, None) for pk in matches)
+        
+        # One query per content type that had hits
+        serialized = {}
+        for kind, viewset in viewsets_by_kind.items():
+            pks = [pk for hit_kind, pk, score in hits if hit_kind == kind]
+            if pks:
+                items = viewset.filter_queryset(viewset.get_base_queryset().filter(pk__in=pks))
+                serialized[kind] = {item['id']: item for item in viewset.get_serializer(items, many=True).data}
+        
+        results = [
+            {'type': kind, 'score': score, 'item': serialized[kind][pk]}
+            for kind, pk, score in hits
+            if pk in serialized.get(kind, {})
+        ]
+        counts = {kind: 0 for kind in kinds}
+        for result in results:
+            counts[result['type']] += 1
+        
+        return Response({'query': query, 'counts': counts, 'results': results})
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return Response(caching.stats())
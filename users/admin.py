@@ -1,9 +1,7 @@
 from django.contrib import admin
-from django.utils import timezone
-from django.utils.html import strip_tags
-from django.core.mail import EmailMultiAlternatives, get_connection
 from django.contrib import messages
-from .models import Subscriber, Newsletter, Contact
+from .models import Subscriber, Newsletter, NewsletterDelivery, Contact, Job, OutboundEmail
+from .newsletter import enqueue_send
 
 # Register your models here.
 
@@ -39,81 +37,27 @@ class NewsletterAdmin(admin.ModelAdmin):
             self.message_user(request, f"Newsletter '{newsletter.subject}' has already been sent on {newsletter.sent_at}.", level=messages.WARNING)
             return
         
-        # Get all active subscribers
-        active_subscribers = Subscriber.objects.filter(is_active=True)
-        
-        if not active_subscribers.exists():
+        if not Subscriber.objects.filter(is_active=True).exists():
             self.message_user(request, "No active subscribers found. Newsletter not sent.", level=messages.ERROR)
             return
         
-        # Prepare email data
-        subject = newsletter.subject
-        from_email = 'noreply@siargao.com'
-        html_message = newsletter.content
-        plain_message = strip_tags(html_message)
-        
-        # Send emails in batches for efficiency
-        batch_size = 50  # Send emails in batches of 50 recipients
-        total_subscribers = active_subscribers.count()
-        success_count = 0
-        failed_emails = []
-        
-        # Process subscribers in batches
-        subscriber_batches = [active_subscribers[i:i+batch_size] for i in range(0, total_subscribers, batch_size)]
-        
-        for batch in subscriber_batches:
-            # For each batch, create a mass email
-            messages_to_send = []
-            for subscriber in batch:
-                # Create an email message with both HTML and plain text versions
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=plain_message,
-                    from_email=from_email,
-                    to=[subscriber.email],
-                )
-                email.attach_alternative(html_message, "text/html")
-                messages_to_send.append(email)
-            
-            # Send all emails in this batch
-            try:
-                # Use connection to send all emails in one connection
-                connection = get_connection()
-                connection.open()
-                connection.send_messages(messages_to_send)
-                connection.close()
-                success_count += len(batch)
-            except Exception as e:
-                # If batch sending fails, try sending individually to identify which emails failed
-                for i, subscriber in enumerate(batch):
-                    try:
-                        messages_to_send[i].send()
-                        success_count += 1
-                    except Exception as e:
-                        failed_emails.append({
-                            'email': subscriber.email,
-                            'error': str(e)
-                        })
-        
-        # Mark the newsletter as sent if at least one email was successfully sent
-        if success_count > 0:
-            newsletter.sent = True
-            newsletter.sent_at = timezone.now()
-            newsletter.save()
-            
-            success_message = f"Newsletter sent to {success_count} out of {total_subscribers} active subscribers."
-            if failed_emails:
-                failed_list = ', '.join([f['email'] for f in failed_emails[:5]])
-                if len(failed_emails) > 5:
-                    failed_list += f" and {len(failed_emails) - 5} more"
-                success_message += f" Failed to send to: {failed_list}"
-                
-            self.message_user(request, success_message)
-        else:
-            self.message_user(request, "Failed to send the newsletter. Please check your email configuration.", level=messages.ERROR)
+        # Sent in the background by `manage.py run_jobs`
+        job = enqueue_send(newsletter)
+        self.message_user(request, f"Newsletter '{newsletter.subject}' queued for sending as job #{job.id}. Track its progress under Jobs.")
     
     send_newsletter.short_description = "Send newsletter to all active subscribers"
 
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('email', 'newsletter', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'newsletter')
+    search_fields = ('email',)
+    list_select_related = ('newsletter',)
+    readonly_fields = [field.name for field in NewsletterDelivery._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ('name', 'email', 'inquiry_type', 'subject', 'created_at', 'is_read')
@@ -127,3 +71,22 @@ class ContactAdmin(admin.ModelAdmin):
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
     mark_as_read.short_description = "Mark selected messages as read"
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress_done', 'progress_total', 'success_count', 'failure_count', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = [field.name for field in Job._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'to', 'subject', 'status', 'digest', 'attempts', 'send_after', 'sent_at')
+    list_filter = ('kind', 'status', 'digest')
+    search_fields = ('to', 'subject')
+    readonly_fields = [field.name for field in OutboundEmail._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
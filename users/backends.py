@@ -0,0 +1,41 @@
+"""
+Email backend that appends messages to a local mbox file (EMAIL_MBOX_PATH),
+a stand-in for SMTP when testing sends end to end. The result opens in any
+mail client or with Python's `mailbox` module.
+"""
+import re
+import threading
+import time
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+
+# Connections may be used from several threads (see users.delivery)
+_lock = threading.Lock()
+
+FROM_LINE = re.compile(rb'^(>*From )', re.MULTILINE)
+
+def mbox_entry(data):
+    # mboxrd: quote body lines that would read as a message separator
+    data = FROM_LINE.sub(rb'>\1', data)
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    return b'From MAILER-DAEMON ' + time.asctime(time.gmtime()).encode('ascii') + b'\n' + data + b'\n'
+
+class MboxBackend(BaseEmailBackend):
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or settings.EMAIL_MBOX_PATH
+
+    def send_messages(self, email_messages):
+        entries = []
+        for message in email_messages:
+            try:
+                entries.append(mbox_entry(message.message().as_bytes(linesep='\n')))
+            except Exception:
+                if not self.fail_silently:
+                    raise
+        if entries:
+            # Appending without reading the file keeps each write O(message)
+            with _lock, open(self.path, 'ab') as mbox:
+                mbox.write(b''.join(entries))
+        return len(entries)
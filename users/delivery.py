@@ -0,0 +1,204 @@
+"""
+Parallel email delivery over a pool of persistent connections.
+
+`DeliveryEngine.send()` sends messages from a thread pool. Each thread borrows
+one of EMAIL_POOL_SIZE long-lived backend connections, so SMTP handshakes
+happen once per connection per run rather than once per batch. A connection
+that drops is reopened and the message retried (EMAIL_SEND_RETRIES times).
+EMAIL_RATE_LIMIT caps messages per second across all threads.
+
+The transport is any Django email backend: NEWSLETTER_TRANSPORT names one of
+TRANSPORTS or gives a dotted path, and defaults to EMAIL_BACKEND. Every
+batch and the whole run are timed (`last_batch`, `stats`).
+"""
+import logging
+import math
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+    'mbox': 'users.backends.MboxBackend',
+}
+
+def transport_backend(transport=None):
+    """The email backend path for `transport` (a TRANSPORTS name or dotted path); None means EMAIL_BACKEND."""
+    transport = transport or settings.NEWSLETTER_TRANSPORT
+    return TRANSPORTS.get(transport, transport) or None
+
+def is_connection_error(error):
+    # The connection itself is suspect (dropped, socket error); anything else,
+    # e.g. a refused recipient, only fails the message
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def is_permanent_error(error):
+    # An invalid address or a 5xx reply (e.g. unknown mailbox) won't succeed on retry
+    if isinstance(error, ValueError):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second (0: unlimited)."""
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of the sorted list `values`."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+class DeliveryStats:
+    """Throughput, per-message latency and failures of a batch or a whole run."""
+    def __init__(self):
+        self.latencies = []
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def add(self, latencies, failed, elapsed):
+        self.latencies.extend(latencies)
+        self.failed += failed
+        self.elapsed += elapsed
+
+    def summary(self):
+        count = len(self.latencies)
+        latencies = sorted(self.latencies)
+        latency_ms = {f'p{pct}': round(percentile(latencies, pct) * 1000, 1) for pct in (50, 90, 99)}
+        latency_ms['max'] = round(latencies[-1] * 1000, 1) if latencies else 0.0
+        return {
+            'messages': count,
+            'failed': self.failed,
+            'failure_rate': round(self.failed / count, 4) if count else 0.0,
+            'seconds': round(self.elapsed, 3),
+            'messages_per_sec': round(count / self.elapsed, 1) if self.elapsed else 0.0,
+            'latency_ms': latency_ms,
+        }
+
+    def __str__(self):
+        summary = self.summary()
+        latency = summary['latency_ms']
+        return (
+            f"{summary['messages']} messages in {summary['seconds']}s ({summary['messages_per_sec']}/s), "
+            f"{summary['failed']} failed, latency p50 {latency['p50']}ms p90 {latency['p90']}ms p99 {latency['p99']}ms"
+        )
+
+class ConnectionPool:
+    def __init__(self, size, backend=None, **connection_kwargs):
+        self.connections = queue.LifoQueue()
+        self.all = []
+        for _ in range(size):
+            connection = get_connection(backend, **connection_kwargs)
+            self.connections.put(connection)
+            self.all.append(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    def close(self):
+        for connection in self.all:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+class DeliveryEngine:
+    """
+    Send messages in parallel. Use as a context manager, or call `close()`,
+    so the pooled connections are released.
+    """
+    def __init__(self, pool_size=None, rate=None, retries=None, backend=None, transport=None, **connection_kwargs):
+        self.pool_size = pool_size or settings.EMAIL_POOL_SIZE
+        self.retries = settings.EMAIL_SEND_RETRIES if retries is None else retries
+        self.limiter = RateLimiter(settings.EMAIL_RATE_LIMIT if rate is None else rate)
+        self.pool = ConnectionPool(self.pool_size, backend or transport_backend(transport), **connection_kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='email')
+        self.stats = DeliveryStats()
+        self.last_batch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+        if self.stats.latencies:
+            logger.info("Delivery run: %s", self.stats)
+
+    def send_one(self, message):
+        """Send `message`; return None, or the error that made it fail."""
+        for attempt in range(self.retries + 1):
+            with self.pool.connection() as connection:
+                try:
+                    # Opened lazily and kept open: a no-op when already connected
+                    connection.open()
+                    connection.send_messages([message])
+                    return None
+                except Exception as e:
+                    if not is_connection_error(e):
+                        return e
+                    error = e
+                    # Drop the broken connection; the next use reopens it
+                    try:
+                        connection.close()
+                    except Exception:
+                        connection.connection = None
+        return error
+
+    def timed_send(self, message):
+        # Latency covers the send itself, not waiting on the rate limit
+        self.limiter.acquire()
+        start = time.perf_counter()
+        error = self.send_one(message)
+        return error, time.perf_counter() - start
+
+    def send(self, messages):
+        """Send `messages`; return the error (or None) for each, in order."""
+        start = time.perf_counter()
+        results = list(self.executor.map(self.timed_send, messages))
+        errors = [error for error, _ in results]
+
+        batch = DeliveryStats()
+        batch.add([latency for _, latency in results], sum(error is not None for error in errors), time.perf_counter() - start)
+        self.stats.add(batch.latencies, batch.failed, batch.elapsed)
+        self.last_batch = batch
+        logger.info("Delivery batch: %s", batch)
+        return errors
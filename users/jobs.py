@@ -0,0 +1,123 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in `Job`, so no broker is needed: `enqueue()` adds one and
+`manage.py run_jobs` claims and runs them. A claim is a conditional UPDATE
+from `queued` to `running`, so any number of workers can poll the same table
+without running a job twice. Running jobs refresh `locked_at` as they report
+progress; one whose worker died is re-queued once its lock is older than
+JOB_LOCK_TIMEOUT (workers check for those at most once per timeout). A job
+whose handler raises is re-queued with exponential backoff
+(JOB_RETRY_BACKOFF, up to JOB_RETRY_BACKOFF_MAX). Either way, a job is
+marked failed after JOB_MAX_ATTEMPTS tries.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+# When this process next looks for jobs whose worker died
+_next_requeue = None
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`. It gets the Job and returns a JSON-able result."""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+def enqueue(kind, payload=None, run_after=None):
+    return Job.objects.create(kind=kind, payload=payload or {}, run_after=run_after or timezone.now())
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def requeue_stale(now=None):
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+    stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status='failed', error='Worker stopped responding', finished_at=now, locked_by='', locked_at=None,
+    )
+    stale.update(status='queued', locked_by='', locked_at=None)
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX,
+    ))
+
+def claim(worker_id):
+    """Lock and return the next due job, or None."""
+    global _next_requeue
+    now = timezone.now()
+    # A lock can't go stale faster than the timeout, so checking more often only costs UPDATEs
+    if _next_requeue is None or now >= _next_requeue:
+        requeue_stale(now)
+        _next_requeue = now + timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    due = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+    for job_id in due.values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+        # Taken by another worker in the meantime
+    return None
+
+def report_progress(job, **counts):
+    """Save progress counters (progress_total/done, success/failure_count) and refresh the lock."""
+    for field, value in counts.items():
+        setattr(job, field, value)
+    job.locked_at = timezone.now()
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(locked_at=job.locked_at, **counts)
+
+def _finish(job, status, **fields):
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=status, finished_at=timezone.now(), locked_by='', locked_at=None, **fields,
+    )
+
+def run(job):
+    func = _handlers.get(job.kind)
+    if func is None:
+        _finish(job, 'failed', error=f'No handler for job kind "{job.kind}"')
+        return
+    try:
+        result = func(job)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                status='queued', run_after=timezone.now() + retry_delay(job.attempts),
+                locked_by='', locked_at=None, error=traceback.format_exc(),
+            )
+        else:
+            _finish(job, 'failed', error=traceback.format_exc())
+    else:
+        _finish(job, 'succeeded', result=result or {})
+
+def work(worker_id=None, burst=False, poll_interval=None, should_stop=lambda: False):
+    """Run jobs until `should_stop()`; with `burst`, until the queue is empty. Returns the number run."""
+    worker_id = worker_id or default_worker_id()
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    processed = 0
+    while not should_stop():
+        close_old_connections()
+        job = claim(worker_id)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        processed += 1
+    close_old_connections()
+    return processed
@@ -0,0 +1,188 @@
+"""
+Bulk subscriber import and export.
+
+Imports read CSV or JSON (an array, or one value per line) from a file
+object a chunk at a time, so an upload of any size is parsed in constant
+memory. Each chunk of IMPORT_BATCH_SIZE rows is normalized, deduplicated and
+written with one `bulk_create`. If the input has an `is_active` column (e.g.
+a previous export), existing subscribers get that status. Otherwise only new
+addresses are added, so an import never resubscribes someone who opted out.
+
+`export_rows()` yields CSV lines over an id keyset, so exports stream in
+constant memory too.
+"""
+import codecs
+import csv
+import io
+import json
+import re
+from itertools import islice
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from backend.renderers import StreamedFormatRenderer
+from .models import Subscriber
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 2000
+READ_SIZE = 64 * 1024
+# Longest JSON value (in characters) an import reads ahead for before giving up on it
+MAX_RECORD_SIZE = 1024 * 1024
+INVALID_SAMPLE_SIZE = 20
+EXPORT_FIELDS = ['email', 'is_active', 'subscribed_at']
+# Between JSON values: whitespace, commas and the brackets of a top-level array
+SEPARATORS = re.compile(r'[ \t\r\n,\[\]]*')
+
+class CSVRenderer(StreamedFormatRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+def parse_active(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() not in ('', '0', 'false', 'no', 'n', 'inactive')
+
+def detect_format(name):
+    return 'json' if name.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv'
+
+def text_stream(file):
+    # Uploads and files opened in binary mode are decoded incrementally
+    if isinstance(file, io.TextIOBase):
+        return file
+    return codecs.getreader('utf-8-sig')(file)
+
+def iter_csv(file):
+    """Yield `(email, is_active or None)` from CSV with an `email` header column, or emails in the first column."""
+    reader = csv.reader(text_stream(file))
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [column.strip().lower() for column in first]
+    if 'email' in header:
+        email_column = header.index('email')
+        active_column = header.index('is_active') if 'is_active' in header else None
+    else:
+        email_column, active_column = 0, None
+        reader = (row for rows in ([first], reader) for row in rows)
+    for row in reader:
+        if len(row) <= email_column:
+            continue
+        active = parse_active(row[active_column]) if active_column is not None and len(row) > active_column else None
+        yield row[email_column], active
+
+def iter_json_values(file):
+    """Yield the values of a top-level JSON array, or of whitespace/comma separated JSON values (JSON Lines)."""
+    stream = text_stream(file)
+    decoder = json.JSONDecoder()
+    # Values are decoded in place from `index`; the consumed prefix is only dropped when reading more.
+    # `offset` is the position of buffer[0] in the input, for error messages.
+    buffer, index, offset, eof = '', 0, 0, False
+    while True:
+        index = SEPARATORS.match(buffer, index).end()
+        if index == len(buffer):
+            if eof:
+                return
+            offset += len(buffer)
+            buffer, index = stream.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, index)
+        except json.JSONDecodeError:
+            value, end = None, None
+        # A value that reaches the end of the buffer may be cut short (e.g. a number)
+        if end is None or (end == len(buffer) and not eof):
+            if eof:
+                raise ValueError(f'Invalid JSON at character {offset + index}: {buffer[index:index + 50]!r}')
+            # A malformed value never completes; don't read the rest of the input looking for its end
+            if len(buffer) - index > MAX_RECORD_SIZE:
+                raise ValueError(
+                    f'Invalid JSON, or a value over {MAX_RECORD_SIZE} characters, '
+                    f'at character {offset + index}: {buffer[index:index + 50]!r}'
+                )
+            chunk = stream.read(READ_SIZE)
+            offset += index
+            buffer, index, eof = buffer[index:] + chunk, 0, not chunk
+            continue
+        index = end
+        yield value
+
+def iter_json(file):
+    """Yield `(email, is_active or None)` from JSON strings or objects with an `email` key."""
+    for value in iter_json_values(file):
+        if isinstance(value, dict):
+            yield value.get('email', value), parse_active(value.get('is_active'))
+        else:
+            yield value, None
+
+def normalize(email):
+    """Return the address as stored, or None if it isn't valid."""
+    if not isinstance(email, str):
+        return None
+    email = BaseUserManager.normalize_email(email.strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None
+    return email
+
+def import_subscribers(file, format='csv', batch_size=IMPORT_BATCH_SIZE):
+    """Import subscribers from `file` ('csv' or 'json'); return counts and a sample of invalid values."""
+    rows = iter_json(file) if format == 'json' else iter_csv(file)
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'invalid': 0, 'invalid_samples': []}
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        result['rows'] += len(chunk)
+
+        batch = {}
+        for raw, active in chunk:
+            email = normalize(raw)
+            if email is None:
+                result['invalid'] += 1
+                if len(result['invalid_samples']) < INVALID_SAMPLE_SIZE:
+                    result['invalid_samples'].append(str(raw)[:254])
+            elif email in batch:
+                # Last one wins, as a later row would on its own
+                result['duplicates'] += 1
+                batch[email] = active
+            else:
+                batch[email] = active
+        if not batch:
+            continue
+
+        existing = set(Subscriber.objects.filter(email__in=batch).values_list('email', flat=True))
+        upserts = [Subscriber(email=email, is_active=active) for email, active in batch.items() if active is not None]
+        inserts = [Subscriber(email=email) for email, active in batch.items() if active is None and email not in existing]
+        if upserts:
+            Subscriber.objects.bulk_create(upserts, update_conflicts=True, unique_fields=['email'], update_fields=['is_active'])
+        if inserts:
+            # Also covers addresses added concurrently since `existing` was read
+            Subscriber.objects.bulk_create(inserts, ignore_conflicts=True)
+        result['created'] += len(batch.keys() - existing)
+        updated = sum(1 for subscriber in upserts if subscriber.email in existing)
+        result['updated'] += updated
+        result['unchanged'] += len(existing) - updated
+    return result
+
+class Echo:
+    """A file-like object whose write() returns the value, for csv.writer in a generator."""
+    def write(self, value):
+        return value
+
+def export_rows(queryset=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the CSV export of `queryset` (default: all subscribers): the header, then one chunk per batch."""
+    queryset = Subscriber.objects.all() if queryset is None else queryset
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', *EXPORT_FIELDS)[:batch_size])
+        if not batch:
+            return
+        yield ''.join(
+            writer.writerow([email, 'true' if is_active else 'false', subscribed_at.isoformat()])
+            for _, email, is_active, subscribed_at in batch
+        )
+        last_id = batch[-1][0]
@@ -0,0 +1,64 @@
+import time
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.utils.html import strip_tags
+from users.delivery import DeliveryEngine
+from users.smtp_sink import SMTPSink
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+class Command(BaseCommand):
+    help = 'Measure newsletter delivery throughput (messages/sec) against a local SMTP sink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--pool-sizes', default='1,4,8', help='Comma-separated connection pool sizes to try')
+        parser.add_argument('--latency', type=float, default=0.005, help='Simulated server time per message, in seconds')
+        parser.add_argument('--rate', type=float, default=0, help='Rate cap in messages/sec (0: none)')
+
+    def build_messages(self, count):
+        html = '<h1>Siargao this month</h1>' + '<p>Waves, festivals and island hopping news.</p>' * 40
+        text = strip_tags(html)
+        messages = []
+        for i in range(count):
+            message = EmailMultiAlternatives('Siargao newsletter', text, 'noreply@siargao.com', [f'subscriber{i}@example.com'])
+            message.attach_alternative(html, 'text/html')
+            messages.append(message)
+        return messages
+
+    def report(self, label, count, elapsed, sink, before, latency=''):
+        delivered = sink.count - before
+        self.stdout.write(f'{label:<28}{delivered:>8}{elapsed:>10.2f}s{count / elapsed:>12.1f} msg/s{latency:>22}')
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(delay=options['latency']).start()
+        connection_kwargs = {
+            'host': '127.0.0.1', 'port': sink.port, 'username': '', 'password': '',
+            'use_tls': False, 'use_ssl': False, 'timeout': 10,
+        }
+        count = options['messages']
+        self.stdout.write(f"{count} messages, {options['latency'] * 1000:.1f}ms simulated latency per message")
+        self.stdout.write(f"{'mode':<28}{'sent':>8}{'time':>11}{'throughput':>16}{'p50/p99 ms':>22}")
+        try:
+            # What the old send loop did: a new connection per 50-message batch, sent serially
+            messages = self.build_messages(count)
+            before, start = sink.count, time.perf_counter()
+            for i in range(0, count, 50):
+                connection = get_connection(SMTP_BACKEND, **connection_kwargs)
+                connection.send_messages(messages[i:i + 50])
+            self.report('serial, connection/batch', count, time.perf_counter() - start, sink, before)
+
+            for pool_size in [int(size) for size in options['pool_sizes'].split(',')]:
+                messages = self.build_messages(count)
+                before, start = sink.count, time.perf_counter()
+                with DeliveryEngine(pool_size=pool_size, rate=options['rate'], backend=SMTP_BACKEND, **connection_kwargs) as engine:
+                    errors = [error for error in engine.send(messages) if error]
+                latency = engine.stats.summary()['latency_ms']
+                self.report(
+                    f'pooled, {pool_size} connections', count, time.perf_counter() - start, sink, before,
+                    f"{latency['p50']}/{latency['p99']}",
+                )
+                if errors:
+                    self.stdout.write(self.style.WARNING(f'{len(errors)} failed, e.g. {errors[0]!r}'))
+        finally:
+            sink.stop()
@@ -0,0 +1,57 @@
+import time
+import tracemalloc
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.utils.html import strip_tags
+from users.mime import NewsletterRenderer
+from users.models import Newsletter
+from users.newsletter import BATCH_SIZE, FROM_EMAIL, unsubscribe_url
+
+class Command(BaseCommand):
+    help = 'Compare per-message CPU time and memory of building newsletter emails one by one vs. from a pre-encoded template'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--paragraphs', type=int, default=60, help='Size of the sample newsletter body')
+
+    def build_each(self, newsletter, emails):
+        # What the send loop did before: a new EmailMultiAlternatives per subscriber
+        plain_message = strip_tags(newsletter.content)
+        for address in emails:
+            email = EmailMultiAlternatives(subject=newsletter.subject, body=plain_message, from_email=FROM_EMAIL, to=[address])
+            email.attach_alternative(newsletter.content, "text/html")
+            yield email
+
+    def build_rendered(self, newsletter, emails):
+        renderer = NewsletterRenderer(newsletter, FROM_EMAIL)
+        for address in emails:
+            yield renderer.message(address, unsubscribe_url(address))
+
+    def measure(self, build, newsletter, emails):
+        start = time.process_time()
+        # Encoded as the SMTP backend does it
+        size = sum(len(message.message().as_bytes(linesep='\r\n')) for message in build(newsletter, emails))
+        cpu = (time.process_time() - start) / len(emails)
+
+        # Peak memory while one send batch is built and encoded
+        tracemalloc.start()
+        batch = list(build(newsletter, emails[:BATCH_SIZE]))
+        for message in batch:
+            message.message().as_bytes(linesep='\r\n')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return cpu, peak, size / len(emails)
+
+    def handle(self, *args, **options):
+        content = '<h1>Siargao this month</h1>' + ''.join(
+            f'<p>Paragraph {i}: surf breaks, island hopping, festivals and where to eat in General Luna. Café ☀</p>\n'
+            for i in range(options['paragraphs'])
+        )
+        newsletter = Newsletter(subject='What’s on in Siargao', content=content)
+        emails = [f'subscriber{i}@example.com' for i in range(options['messages'])]
+
+        self.stdout.write(f"{options['messages']} messages, {len(content.encode())} byte HTML body")
+        self.stdout.write(f"{'mode':<22}{'CPU µs/msg':>12}{f'peak KiB/{BATCH_SIZE}':>14}{'bytes/msg':>11}")
+        for label, build in [('EmailMultiAlternatives', self.build_each), ('pre-encoded template', self.build_rendered)]:
+            cpu, peak, size = self.measure(build, newsletter, emails)
+            self.stdout.write(f'{label:<22}{cpu * 1e6:>12.1f}{peak / 1024:>14.1f}{size:>11.0f}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from users.outbox import drain
+
+class Command(BaseCommand):
+    help = 'Send the due emails in the outbox now (normally done by the job worker)'
+
+    def handle(self, *args, **options):
+        counts = drain()
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained: {counts['sent']} sent, {counts['retried']} to retry, {counts['failed']} failed"
+        ))
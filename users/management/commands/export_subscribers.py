@@ -0,0 +1,20 @@
+import sys
+from django.core.management.base import BaseCommand
+from users.mailing_list import export_rows
+from users.models import Subscriber
+
+class Command(BaseCommand):
+    help = 'Export subscribers as CSV (email, is_active, subscribed_at) to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file (default: stdout)')
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, **options):
+        queryset = Subscriber.objects.filter(is_active=True) if options['active_only'] else Subscriber.objects.all()
+        if options['path'] == '-':
+            sys.stdout.writelines(export_rows(queryset))
+            return
+        with open(options['path'], 'w', encoding='utf-8', newline='') as file:
+            file.writelines(export_rows(queryset))
+        self.stderr.write(self.style.SUCCESS(f"Exported {queryset.count()} subscribers to {options['path']}"))
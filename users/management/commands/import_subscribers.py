@@ -0,0 +1,31 @@
+import csv
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from users.mailing_list import IMPORT_BATCH_SIZE, detect_format, import_subscribers
+
+class Command(BaseCommand):
+    help = 'Bulk import subscribers from a CSV or JSON file (an `is_active` column also updates existing subscribers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format (default: from the file name, else csv)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or detect_format(path)
+        try:
+            if path == '-':
+                result = import_subscribers(sys.stdin.buffer, import_format, options['batch_size'])
+            else:
+                with open(path, 'rb') as file:
+                    result = import_subscribers(file, import_format, options['batch_size'])
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {result['rows']} rows: {result['created']} new, {result['updated']} updated, "
+            f"{result['unchanged']} already subscribed, {result['duplicates']} duplicates, {result['invalid']} invalid"
+        ))
+        for value in result['invalid_samples']:
+            self.stdout.write(f'- invalid: {value!r}')
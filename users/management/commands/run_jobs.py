@@ -0,0 +1,30 @@
+import signal
+from django.core.management.base import BaseCommand
+from users import jobs
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (newsletter sends, ...) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll-interval', type=float, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--worker-id', type=str, help='Name recorded on claimed jobs (default: host:pid)')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+
+        def stop(signum, frame):
+            # Finish the current job, then exit
+            self.stopping = True
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        worker_id = options['worker_id'] or jobs.default_worker_id()
+        self.stdout.write(f'Worker {worker_id} started')
+        processed = jobs.work(
+            worker_id=worker_id,
+            burst=options['burst'],
+            poll_interval=options['poll_interval'],
+            should_stop=lambda: self.stopping,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} stopped after {processed} jobs'))
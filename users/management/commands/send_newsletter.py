@@ -1,9 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
-from django.utils import timezone
-from django.utils.html import strip_tags
-from django.core.mail import EmailMultiAlternatives, get_connection
 from users.models import Newsletter, Subscriber
-import sys
+from users.newsletter import delivery_counts, enqueue_send, recipient_count, reset_deliveries, send_newsletter
 
 class Command(BaseCommand):
     help = 'Send a newsletter to all active subscribers'
@@ -14,6 +11,10 @@ class Command(BaseCommand):
         parser.add_argument('--content', type=str, help='HTML content of the newsletter')
         parser.add_argument('--list', action='store_true', help='List all newsletters')
         parser.add_argument('--subscribers', action='store_true', help='List all active subscribers')
+        parser.add_argument('--queue', action='store_true', help='Queue the send for the background worker instead of sending now')
+        parser.add_argument('--transport', type=str, help='Send through smtp, console, file or mbox instead of NEWSLETTER_TRANSPORT (immediate sends only)')
+        parser.add_argument('--preview', action='store_true', help='Write every copy to --transport (default: console) without recording deliveries or marking the newsletter sent (immediate sends only)')
+        parser.add_argument('--resume', action='store_true', help='Finish an interrupted send of --id, retrying failed deliveries without waiting')
 
     def handle(self, *args, **options):
         # List all newsletters
@@ -49,10 +50,17 @@ class Command(BaseCommand):
             except Newsletter.DoesNotExist:
                 raise CommandError(f'Newsletter with ID {options["id"]} does not exist')
             
+            if options['resume']:
+                return self.resume(newsletter, options['transport'], options['preview'])
+            
             if newsletter.sent:
                 self.stdout.write(self.style.WARNING(f'Newsletter "{newsletter.subject}" has already been sent on {newsletter.sent_at}'))
                 if not self.confirm_action('Do you want to send it again?'):
                     return
+                if not options['preview']:
+                    reset_deliveries(newsletter)
+            elif newsletter.deliveries.exists():
+                self.stdout.write(self.style.WARNING(f'Newsletter "{newsletter.subject}" is partly sent; only the remaining recipients will get it'))
         
         # Create and send a new newsletter
         elif options['subject'] and options['content']:
@@ -76,67 +84,55 @@ class Command(BaseCommand):
         if not self.confirm_action(f'Send newsletter "{newsletter.subject}" to {active_subscribers.count()} active subscribers?'):
             return
         
-        # Prepare email data
-        subject = newsletter.subject
-        from_email = 'noreply@siargao.com'
-        html_message = newsletter.content
-        plain_message = strip_tags(html_message)
-        
-        # Send emails in batches
-        batch_size = 50
-        total_subscribers = active_subscribers.count()
-        success_count = 0
-        failed_emails = []
-        
-        # Process subscribers in batches
-        subscriber_batches = [active_subscribers[i:i+batch_size] for i in range(0, total_subscribers, batch_size)]
-        
-        with self.stdout.progressbar(subscriber_batches, prefix='Sending emails: ') as progress_bar:
-            for batch in progress_bar:
-                # Create a mass email
-                messages = []
-                for subscriber in batch:
-                    email = EmailMultiAlternatives(
-                        subject=subject,
-                        body=plain_message,
-                        from_email=from_email,
-                        to=[subscriber.email],
-                    )
-                    email.attach_alternative(html_message, "text/html")
-                    messages.append(email)
-                
-                # Send all emails in this batch
-                try:
-                    connection = get_connection()
-                    connection.open()
-                    connection.send_messages(messages)
-                    connection.close()
-                    success_count += len(batch)
-                except Exception as e:
-                    # If batch sending fails, try sending individually
-                    for i, subscriber in enumerate(batch):
-                        try:
-                            messages[i].send()
-                            success_count += 1
-                        except Exception as e:
-                            failed_emails.append({
-                                'email': subscriber.email,
-                                'error': str(e)
-                            })
+        if options['queue']:
+            job = enqueue_send(newsletter)
+            self.stdout.write(self.style.SUCCESS(f'Queued as job #{job.id}; run `manage.py run_jobs` to send it'))
+            return
         
-        # Mark the newsletter as sent
-        if success_count > 0:
-            newsletter.sent = True
-            newsletter.sent_at = timezone.now()
-            newsletter.save()
+        self.send(newsletter, transport=options['transport'], preview=options['preview'])
+    
+    def resume(self, newsletter, transport=None, preview=False):
+        counts = delivery_counts(newsletter)
+        if not counts['pending']:
+            self.stdout.write(self.style.WARNING(f'Newsletter "{newsletter.subject}" has no pending deliveries'))
+            return
+        self.send(newsletter, retry_now=True, transport=transport, preview=preview)
+    
+    def send(self, newsletter, retry_now=False, transport=None, preview=False):
+        total_subscribers = recipient_count(newsletter, preview)
+        result = send_newsletter(newsletter, retry_now=retry_now, transport=transport, preview=preview, progress=lambda done, success, failed, stats: self.stdout.write(
+            f"Sending emails: {done}/{total_subscribers} ({failed} failed) - "
+            f"{stats['messages_per_sec']} msgs/sec, p90 {stats['latency_ms']['p90']}ms"
+        ))
+        stats = result['stats']
+        failed_emails = result['failed_emails']
         
         # Print results
-        self.stdout.write(self.style.SUCCESS(f'\nNewsletter sent to {success_count} out of {total_subscribers} active subscribers'))
+        if result.get('preview'):
+            self.stdout.write(self.style.SUCCESS(
+                f'\nPreview written for {result["success_count"]} out of {total_subscribers} subscribers; '
+                f'no deliveries were recorded and the newsletter is still unsent'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\nNewsletter sent to {result["success_count"]} out of {total_subscribers} subscribers'))
+        self.stdout.write(
+            f"This run: {stats['messages']} messages in {stats['seconds']}s ({stats['messages_per_sec']} msgs/sec), "
+            f"failure rate {stats['failure_rate']:.1%}, latency p50/p90/p99 "
+            f"{stats['latency_ms']['p50']}/{stats['latency_ms']['p90']}/{stats['latency_ms']['p99']}ms"
+        )
+        
+        if result['pending_count']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['pending_count']} deliveries failed and will be retried; "
+                f"run again with --id {newsletter.id} --resume, or queue it with --queue"
+            ))
         
         if failed_emails:
             self.stdout.write(self.style.WARNING('\nFailed to send to the following emails:'))
             for failure in failed_emails:
                 self.stdout.write(f"- {failure['email']}: {failure['error']}")
+            if result['failure_count'] > len(failed_emails):
+                self.stdout.write(f"... and {result['failure_count'] - len(failed_emails)} more")
     
     def confirm_action(self, message):
         """Ask for confirmation before proceeding"""
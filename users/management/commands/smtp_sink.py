@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from users.smtp_sink import SMTPSink
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP server that accepts and discards all mail (point EMAIL_HOST/EMAIL_PORT at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--delay', type=float, default=0, help='Seconds to wait before accepting each message')
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(options['host'], options['port'], delay=options['delay'])
+        self.stdout.write(f"SMTP sink listening on {options['host']}:{sink.port}")
+        try:
+            sink.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.server_close()
+            self.stdout.write(f'Received {sink.count} messages')
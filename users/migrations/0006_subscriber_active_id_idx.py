@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(fields=['is_active', 'id'], name='subscriber_active_id_idx'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+"""
+Pre-encoded newsletter messages.
+
+Every copy of a newsletter has the same subject and body, so
+`NewsletterRenderer` encodes them to MIME once. Each recipient's bytes are
+then built by joining the pre-encoded pieces with the few per-recipient
+parts: To, Message-ID, List-Unsubscribe and the unsubscribe link in the body.
+
+Bodies are quoted-printable. The link is spliced between soft line breaks
+(`=` + CRLF), which decode to nothing, so the encoded pieces on either side
+never need re-wrapping.
+"""
+import secrets
+from email import quoprimime
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from html import escape
+from django.conf import settings
+from django.core.mail.message import DNS_NAME, sanitize_address
+from django.utils.html import strip_tags
+
+CRLF = b'\r\n'
+SOFT_BREAK = b'=' + CRLF
+
+def qp(text):
+    # quoprimime works on byte values, one per character
+    return quoprimime.body_encode(text.encode('utf-8').decode('latin-1'), eol='\r\n').encode('ascii')
+
+def header(name, value):
+    if not value.isascii():
+        value = Header(value, 'utf-8', header_name=name).encode(linesep='\r\n')
+    return f'{name}: {value}'.encode('ascii') + CRLF
+
+class EncodedMessage:
+    """The finished bytes, with the parts of email.message.Message the mail backends use."""
+    def __init__(self, data):
+        self.data = data
+
+    def as_bytes(self, linesep='\n'):
+        return self.data if linesep == '\r\n' else self.data.replace(CRLF, linesep.encode('ascii'))
+
+    def as_string(self, linesep='\n'):
+        return self.as_bytes(linesep).decode('ascii')
+
+    def get_charset(self):
+        return None
+
+class PreparedMessage:
+    """
+    One recipient's copy. It stands in for an EmailMessage with the mail
+    backends and users.delivery, which only need `recipients()`,
+    `from_email`, `encoding` and `message()`.
+    """
+    encoding = 'utf-8'
+
+    def __init__(self, renderer, email, unsubscribe_url):
+        self.renderer = renderer
+        self.subject = renderer.subject
+        self.from_email = renderer.from_email
+        self.to = [email]
+        self.unsubscribe_url = unsubscribe_url
+
+    def recipients(self):
+        return self.to
+
+    def message(self):
+        # Raises ValueError for an invalid address, as EmailMessage.message() does
+        return EncodedMessage(self.renderer.encode(self.to[0], self.unsubscribe_url))
+
+class NewsletterRenderer:
+    def __init__(self, newsletter, from_email):
+        self.subject = ' '.join(newsletter.subject.splitlines())
+        self.from_email = from_email
+        boundary = f'==============={secrets.token_hex(16)}=='
+
+        self.head = b''.join([
+            header('Subject', self.subject),
+            header('From', sanitize_address(from_email, 'utf-8')),
+            header('Date', formatdate(localtime=settings.EMAIL_USE_LOCALTIME)),
+            b'MIME-Version: 1.0' + CRLF,
+            header('Content-Type', f'multipart/alternative;\r\n boundary="{boundary}"'),
+        ])
+        part_head = (
+            f'--{boundary}\r\n'
+            'Content-Type: text/{}; charset="utf-8"\r\n'
+            'Content-Transfer-Encoding: quoted-printable\r\n\r\n'
+        )
+        html = newsletter.content
+        text = strip_tags(html)
+        text_before, text_after = qp(text + '\n\nUnsubscribe: '), qp('\n')
+        html_before, html_after = qp(html + '\n<p><a href="'), qp('">Unsubscribe</a></p>\n')
+        # Each body is [before, link, after]; the link goes between soft breaks
+        self.text = [part_head.format('plain').encode('ascii') + text_before + SOFT_BREAK, SOFT_BREAK + text_after + CRLF]
+        self.html = [part_head.format('html').encode('ascii') + html_before + SOFT_BREAK, SOFT_BREAK + html_after + CRLF]
+        self.tail = f'--{boundary}--\r\n'.encode('ascii')
+
+    def message(self, email, unsubscribe_url):
+        return PreparedMessage(self, email, unsubscribe_url)
+
+    def encode(self, email, unsubscribe_url):
+        return b''.join([
+            self.head,
+            header('To', sanitize_address(email, 'utf-8')),
+            header('Message-ID', make_msgid(domain=DNS_NAME)),
+            header('List-Unsubscribe', f'<{unsubscribe_url}>'),
+            b'List-Unsubscribe-Post: List-Unsubscribe=One-Click' + CRLF,
+            CRLF,
+            self.text[0], qp(unsubscribe_url), self.text[1],
+            self.html[0], qp(escape(unsubscribe_url)), self.html[1],
+            self.tail,
+        ])
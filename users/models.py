@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 # Create your models here.
@@ -10,6 +11,13 @@ class Subscriber(models.Model):
     
     def __str__(self):
         return self.email
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['subscribed_at', 'id'], name='subscriber_subscribed_id_idx'),
+            # Keyset iteration over active subscribers when sending newsletters
+            models.Index(fields=['is_active', 'id'], name='subscriber_active_id_idx'),
+        ]
 
 class Newsletter(models.Model):
     subject = models.CharField(max_length=200)
@@ -21,6 +29,33 @@ class Newsletter(models.Model):
     def __str__(self):
         return self.subject
 
+class NewsletterDelivery(models.Model):
+    """One recipient of a newsletter send; the ledger that makes sends resumable (see users.newsletter)."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='deliveries')
+    email = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.newsletter_id} -> {self.email} ({self.status})"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['newsletter', 'email'], name='delivery_newsletter_email_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['newsletter', 'status', 'id'], name='delivery_newsletter_status_idx'),
+        ]
+
 class Contact(models.Model):
     INQUIRY_TYPE_CHOICES = (
         ('general', 'General Inquiry'),
@@ -46,3 +81,76 @@ class Contact(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='contact_created_id_idx'),
+        ]
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py run_jobs` (see users.jobs)."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress_total = models.PositiveIntegerField(default=0)
+    progress_done = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx'),
+        ]
+
+class OutboundEmail(models.Model):
+    """A transactional email waiting in the outbox, sent in the background (see users.outbox)."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=50)
+    contact = models.ForeignKey(Contact, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_emails')
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    send_after = models.DateTimeField(default=timezone.now)
+    digest = models.BooleanField(default=False, help_text='Held back to be merged with others to the same address')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.kind} to {self.to} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'send_after', 'id'], name='outbox_status_send_after_idx'),
+            models.Index(fields=['kind', 'created_at'], name='outbox_kind_created_idx'),
+        ]
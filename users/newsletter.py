@@ -0,0 +1,269 @@
+"""
+Newsletter delivery, shared by the API, the admin action and the
+send_newsletter command. Sends normally run in the background as a
+`newsletter.send` job (see users.jobs).
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.urls import reverse
+from django.utils import timezone
+from . import jobs
+from .delivery import DeliveryEngine, is_permanent_error
+from .mime import NewsletterRenderer
+from .models import Job, Newsletter, NewsletterDelivery, Subscriber
+
+SEND_JOB = 'newsletter.send'
+FROM_EMAIL = 'noreply@siargao.com'
+BATCH_SIZE = 50
+LEDGER_BATCH_SIZE = 1000
+FAILED_EMAILS_LIMIT = 100
+UNSUBSCRIBE_SALT = 'users.newsletter.unsubscribe'
+
+def unsubscribe_token(email):
+    return signing.dumps(email, salt=UNSUBSCRIBE_SALT)
+
+def read_unsubscribe_token(token):
+    """Return the email address `token` was made for, or None if it isn't valid."""
+    try:
+        return signing.loads(token, salt=UNSUBSCRIBE_SALT)
+    except signing.BadSignature:
+        return None
+
+def unsubscribe_url(email):
+    return settings.SITE_URL.rstrip('/') + reverse('subscriber-unsubscribe-link', args=[unsubscribe_token(email)])
+
+def recipient_snapshot():
+    """Return `(up_to_id, count)`: the newest subscriber id a send starting now covers, and how many are active."""
+    active = Subscriber.objects.filter(is_active=True)
+    up_to_id = active.aggregate(Max('id'))['id__max'] or 0
+    return up_to_id, active.filter(id__lte=up_to_id).count()
+
+def recipient_batches(up_to_id, batch_size=BATCH_SIZE):
+    """
+    Yield lists of `(id, email)` for active subscribers with id <= `up_to_id`.
+
+    Each batch is an `id > last seen` query on the (is_active, id) index, so
+    every query reads just one batch and rows added or removed mid-send can't
+    shift a recipient into the next batch or out of the send.
+    """
+    last_id = 0
+    while True:
+        batch = list(
+            Subscriber.objects.filter(is_active=True, id__gt=last_id, id__lte=up_to_id)
+            .order_by('id').values_list('id', 'email')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+
+def prepare_deliveries(newsletter):
+    """
+    Snapshot the recipients of `newsletter` into its delivery ledger, unless
+    that was already done; return the number of recipients.
+    """
+    with transaction.atomic():
+        # Serializes concurrent sends; the ledger is written in full or not at all
+        Newsletter.objects.select_for_update().filter(pk=newsletter.pk).first()
+        if not newsletter.deliveries.exists():
+            up_to_id, _ = recipient_snapshot()
+            for batch in recipient_batches(up_to_id, batch_size=LEDGER_BATCH_SIZE):
+                NewsletterDelivery.objects.bulk_create(
+                    [NewsletterDelivery(newsletter=newsletter, email=email) for _, email in batch],
+                    ignore_conflicts=True,
+                )
+    return newsletter.deliveries.count()
+
+def reset_deliveries(newsletter):
+    """Forget previous deliveries so the next send goes to every active subscriber again."""
+    newsletter.deliveries.all().delete()
+
+def delivery_counts(newsletter):
+    counts = dict.fromkeys(['pending', 'sent', 'failed'], 0)
+    counts.update(newsletter.deliveries.values_list('status').annotate(count=Count('id')).order_by())
+    return counts
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(
+        settings.NEWSLETTER_RETRY_BACKOFF * 2 ** (attempts - 1), settings.NEWSLETTER_RETRY_BACKOFF_MAX,
+    ))
+
+def due_deliveries(newsletter, now=None, batch_size=BATCH_SIZE):
+    """Yield batches of pending deliveries whose retry time has come (all of them if `now` is None)."""
+    pending = newsletter.deliveries.filter(status='pending')
+    if now is not None:
+        pending = pending.filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id).order_by('id').only('id', 'email', 'attempts')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+def resumes_ledger(newsletter):
+    # A partly sent newsletter goes to its pending deliveries; a draft, or a
+    # sent newsletter being sent again, to the current active subscribers
+    return not newsletter.sent and newsletter.deliveries.exists()
+
+def preview_batches(newsletter, batch_size=BATCH_SIZE):
+    """Yield lists of the addresses a real send would go to next."""
+    if resumes_ledger(newsletter):
+        for batch in due_deliveries(newsletter, batch_size=batch_size):
+            yield [delivery.email for delivery in batch]
+    else:
+        up_to_id, _ = recipient_snapshot()
+        for batch in recipient_batches(up_to_id, batch_size=batch_size):
+            yield [email for _, email in batch]
+
+def recipient_count(newsletter, preview=False):
+    """How many recipients a send of `newsletter` covers; snapshots the ledger unless it's a preview."""
+    if not preview:
+        return prepare_deliveries(newsletter)
+    if resumes_ledger(newsletter):
+        return newsletter.deliveries.filter(status='pending').count()
+    return recipient_snapshot()[1]
+
+def preview_newsletter(newsletter, progress=None, transport=None):
+    """
+    Render `newsletter` for everyone a send would reach and hand the copies
+    to `transport` (file or mbox, say; console when not given, since the
+    default transport delivers for real). Nothing is written to the delivery ledger and the newsletter isn't marked
+    sent, so the real send (or `--resume`) still goes to every recipient
+    afterwards.
+    """
+    total_subscribers = recipient_count(newsletter, preview=True)
+    renderer = NewsletterRenderer(newsletter, FROM_EMAIL)
+    success_count = failure_count = 0
+    failed_emails = []
+
+    with DeliveryEngine(transport=transport or 'console') as engine:
+        for batch in preview_batches(newsletter):
+            errors = engine.send([renderer.message(email, unsubscribe_url(email)) for email in batch])
+            for email, error in zip(batch, errors):
+                if error is None:
+                    success_count += 1
+                    continue
+                failure_count += 1
+                if len(failed_emails) < FAILED_EMAILS_LIMIT:
+                    failed_emails.append({'email': email, 'error': str(error)})
+            if progress:
+                progress(success_count + failure_count, success_count, failure_count, engine.last_batch.summary())
+
+    return {
+        'preview': True,
+        'stats': engine.stats.summary(),
+        'success_count': success_count,
+        'total_subscribers': total_subscribers,
+        'pending_count': 0,
+        'retry_at': None,
+        'failure_count': failure_count,
+        'failed_emails': failed_emails,
+    }
+
+def send_newsletter(newsletter, progress=None, retry_now=False, transport=None, preview=False):
+    """
+    Send `newsletter` to its pending recipients over a pool of parallel
+    connections (see users.delivery), recording each outcome in its delivery
+    ledger one batch at a time. Each copy carries the recipient's own
+    unsubscribe link and List-Unsubscribe header.
+
+    The first call snapshots the active subscribers into the ledger; later
+    calls resume it, so a send interrupted by a crash or restart picks up
+    where it stopped (repeating at most the batch in flight). Failed
+    deliveries are retried with exponential backoff up to
+    NEWSLETTER_MAX_ATTEMPTS; pass `retry_now` to retry them without waiting.
+    The newsletter is marked sent once no delivery is pending.
+
+    `transport` overrides NEWSLETTER_TRANSPORT (see users.delivery); with
+    `preview`, `preview_newsletter` runs instead and nothing is recorded.
+    `progress(done, success_count, failure_count, batch_stats)` is called
+    after every batch; the result includes `stats` for the whole run.
+    """
+    if preview:
+        return preview_newsletter(newsletter, progress=progress, transport=transport)
+
+    total_subscribers = prepare_deliveries(newsletter)
+    counts = delivery_counts(newsletter)
+
+    # Subject and body are encoded once; each copy only adds its recipient's parts
+    renderer = NewsletterRenderer(newsletter, FROM_EMAIL)
+
+    with DeliveryEngine(transport=transport) as engine:
+        for batch in due_deliveries(newsletter, now=None if retry_now else timezone.now()):
+            messages = [renderer.message(delivery.email, unsubscribe_url(delivery.email)) for delivery in batch]
+            errors = engine.send(messages)
+            now = timezone.now()
+            for delivery, error in zip(batch, errors):
+                delivery.attempts += 1
+                delivery.next_attempt_at = None
+                if error is None:
+                    delivery.status = 'sent'
+                    delivery.sent_at = now
+                    delivery.last_error = ''
+                else:
+                    delivery.last_error = str(error)
+                    if is_permanent_error(error) or delivery.attempts >= settings.NEWSLETTER_MAX_ATTEMPTS:
+                        delivery.status = 'failed'
+                    else:
+                        delivery.next_attempt_at = now + retry_delay(delivery.attempts)
+                if delivery.status != 'pending':
+                    counts['pending'] -= 1
+                    counts[delivery.status] += 1
+            NewsletterDelivery.objects.bulk_update(batch, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at'])
+
+            if progress:
+                progress(counts['sent'] + counts['failed'], counts['sent'], counts['failed'], engine.last_batch.summary())
+
+    # Mark the newsletter as sent once every recipient has been dealt with
+    if counts['pending'] == 0 and counts['sent'] > 0:
+        newsletter.sent = True
+        newsletter.sent_at = timezone.now()
+        newsletter.save()
+
+    pending = newsletter.deliveries.filter(status='pending')
+    failed = newsletter.deliveries.filter(status='failed').order_by('id')
+    return {
+        'stats': engine.stats.summary(),
+        'success_count': counts['sent'],
+        'total_subscribers': total_subscribers,
+        'pending_count': counts['pending'],
+        'retry_at': pending.aggregate(Min('next_attempt_at'))['next_attempt_at__min'] if counts['pending'] else None,
+        'failure_count': counts['failed'],
+        'failed_emails': [
+            {'email': email, 'error': error}
+            for email, error in failed.values_list('email', 'last_error')[:FAILED_EMAILS_LIMIT]
+        ],
+    }
+
+def enqueue_send(newsletter):
+    """Queue a background send of `newsletter`, or return the one already queued or running."""
+    with transaction.atomic():
+        # Serializes concurrent requests to send the same newsletter
+        Newsletter.objects.select_for_update().filter(pk=newsletter.pk).first()
+        job = Job.objects.filter(
+            kind=SEND_JOB, payload__newsletter_id=newsletter.pk, status__in=['queued', 'running'],
+        ).first()
+        if job is None:
+            job = jobs.enqueue(SEND_JOB, {'newsletter_id': newsletter.pk})
+    return job
+
+@jobs.handler(SEND_JOB)
+def run_send_job(job):
+    newsletter = Newsletter.objects.get(pk=job.payload['newsletter_id'])
+    if newsletter.sent:
+        return {'detail': 'This newsletter has already been sent'}
+
+    jobs.report_progress(job, progress_total=recipient_count(newsletter))
+    result = send_newsletter(newsletter, progress=lambda done, success, failed, stats: jobs.report_progress(
+        job, progress_done=done, success_count=success, failure_count=failed, result={'last_batch': stats},
+    ))
+    if result['pending_count']:
+        # Come back for the deliveries that are waiting out their backoff
+        retry_at = result['retry_at'] or timezone.now()
+        jobs.enqueue(SEND_JOB, job.payload, run_after=retry_at)
+        result['retry_at'] = retry_at.isoformat()
+    return result
@@ -0,0 +1,141 @@
+"""
+Transactional outbox for emails sent on behalf of a request.
+
+`queue_email()` stores the email as an `OutboundEmail` row in the caller's
+transaction, so it exists exactly when the data it's about (e.g. a Contact)
+was committed, and the request never waits on SMTP. After commit an
+`outbox.drain` job is queued; `drain()` claims due rows in batches, sends
+them over a single connection through users.delivery and retries failures
+with exponential backoff (OUTBOX_RETRY_BACKOFF, up to OUTBOX_RETRY_BACKOFF_MAX).
+
+Once CONTACT_DIGEST_THRESHOLD admin notifications were queued within
+CONTACT_DIGEST_INTERVAL, further ones are held until the end of the current
+interval and sent as one digest.
+"""
+import datetime
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from . import jobs
+from .delivery import DeliveryEngine, is_permanent_error
+from .models import Job, OutboundEmail
+
+DRAIN_JOB = 'outbox.drain'
+CONTACT_ADMIN = 'contact.admin'
+CONTACT_CONFIRMATION = 'contact.confirmation'
+FROM_EMAIL = 'noreply@siargao.com'
+BATCH_SIZE = 50
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(
+        settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), settings.OUTBOX_RETRY_BACKOFF_MAX,
+    ))
+
+def schedule_drain(run_after=None):
+    """Queue a drain job for `run_after` (default: now) unless one is already due by then."""
+    run_after = run_after or timezone.now()
+    if not Job.objects.filter(kind=DRAIN_JOB, status='queued', run_after__lte=run_after).exists():
+        jobs.enqueue(DRAIN_JOB, run_after=run_after)
+
+def digest_slot(now):
+    """The end of the digest interval `now` falls in, if admin notifications are busy enough to hold; else None."""
+    threshold = settings.CONTACT_DIGEST_THRESHOLD
+    interval = settings.CONTACT_DIGEST_INTERVAL
+    if not threshold:
+        return None
+    recent = OutboundEmail.objects.filter(kind=CONTACT_ADMIN, created_at__gte=now - timedelta(seconds=interval))
+    if recent.count() < threshold:
+        return None
+    return datetime.datetime.fromtimestamp((now.timestamp() // interval + 1) * interval, tz=datetime.timezone.utc)
+
+def queue_email(kind, subject, body, to, contact=None, from_email=FROM_EMAIL):
+    """Add an email to the outbox; it is sent once the surrounding transaction commits."""
+    send_after = timezone.now()
+    digest = False
+    if kind == CONTACT_ADMIN:
+        slot = digest_slot(send_after)
+        if slot:
+            send_after, digest = slot, True
+    email = OutboundEmail.objects.create(
+        kind=kind, contact=contact, from_email=from_email, to=to, subject=subject, body=body,
+        send_after=send_after, digest=digest,
+    )
+    transaction.on_commit(lambda: schedule_drain(send_after))
+    return email
+
+def requeue_stale(now):
+    # Claimed by a drainer that died mid-batch
+    OutboundEmail.objects.filter(
+        status='sending', claimed_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    ).update(status='pending', claimed_by='', claimed_at=None)
+
+def claim(claimed_by, now, limit=BATCH_SIZE):
+    due = OutboundEmail.objects.filter(status='pending', send_after__lte=now).order_by('send_after', 'id')
+    ids = list(due.values_list('id', flat=True)[:limit])
+    # Rows another drainer took in the meantime are left out by the status check
+    OutboundEmail.objects.filter(id__in=ids, status='pending').update(status='sending', claimed_by=claimed_by, claimed_at=now)
+    return list(OutboundEmail.objects.filter(claimed_by=claimed_by, status='sending').order_by('id'))
+
+def build_messages(batch):
+    """Return `(messages, groups)`: what to send, and the outbox rows each message covers."""
+    messages, groups, digests = [], [], {}
+    for email in batch:
+        if email.digest:
+            digests.setdefault(email.to, []).append(email)
+        else:
+            messages.append(EmailMessage(email.subject, email.body, email.from_email, [email.to]))
+            groups.append([email])
+    for to, emails in digests.items():
+        subject = f'{len(emails)} new contact messages'
+        body = '\n\n'.join(f'--- {email.subject} ---\n\n{email.body.strip()}' for email in emails)
+        messages.append(EmailMessage(subject, body, emails[0].from_email, [to]))
+        groups.append(emails)
+    return messages, groups
+
+def drain(claimed_by=None, batch_size=BATCH_SIZE):
+    """Send every due email in the outbox; return counts of sent, retried and failed emails."""
+    claimed_by = claimed_by or f'outbox:{uuid.uuid4().hex}'
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    requeue_stale(timezone.now())
+    # A drain sends a handful of emails; one connection is plenty
+    with DeliveryEngine(backend=settings.EMAIL_BACKEND, pool_size=1) as engine:
+        while True:
+            batch = claim(claimed_by, timezone.now(), batch_size)
+            if not batch:
+                break
+            messages, groups = build_messages(batch)
+            now = timezone.now()
+            for emails, error in zip(groups, engine.send(messages)):
+                for email in emails:
+                    email.attempts += 1
+                    email.claimed_by = ''
+                    email.claimed_at = None
+                    if error is None:
+                        email.status = 'sent'
+                        email.sent_at = now
+                        email.last_error = ''
+                    else:
+                        email.last_error = str(error)
+                        if is_permanent_error(error) or email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                            email.status = 'failed'
+                        else:
+                            email.status = 'pending'
+                            email.send_after = now + retry_delay(email.attempts)
+                    counts['retried' if email.status == 'pending' else email.status] += 1
+            OutboundEmail.objects.bulk_update(
+                batch, ['status', 'attempts', 'claimed_by', 'claimed_at', 'sent_at', 'last_error', 'send_after'],
+            )
+    return counts
+
+@jobs.handler(DRAIN_JOB)
+def run_drain_job(job):
+    result = drain()
+    # Come back for retries and held digests
+    next_due = OutboundEmail.objects.filter(status='pending').aggregate(Min('send_after'))['send_after__min']
+    if next_due:
+        schedule_drain(next_due)
+    return result
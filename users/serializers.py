@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Subscriber, Newsletter, Contact
+from .models import Subscriber, Newsletter, Contact, Job
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -73,3 +73,10 @@ class ContactSerializer(serializers.ModelSerializer):
         model = Contact
         fields = ['id', 'name', 'email', 'inquiry_type', 'subject', 'message', 'reference_id', 'created_at', 'is_read']
         read_only_fields = ['created_at', 'is_read']
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'payload', 'status', 'attempts', 'progress_total', 'progress_done',
+                  'success_count', 'failure_count', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
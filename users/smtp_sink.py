@@ -0,0 +1,83 @@
+"""
+A minimal SMTP server that accepts and counts every message.
+
+A local stand-in for the real mail server when testing or benchmarking
+delivery (`manage.py smtp_sink`, `manage.py benchmark_delivery`). `delay`
+adds a fixed pause before each reply to DATA, to mimic a remote server.
+`connections` counts the client connections accepted, so callers can check
+that connections are reused.
+"""
+import socketserver
+import threading
+import time
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.connected()
+        self.reply('220 localhost SMTP sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            verb = line[:4].decode('ascii', 'replace').upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    # Undo dot-stuffing
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                if self.server.delay:
+                    time.sleep(self.server.delay)
+                self.server.received(b''.join(data))
+                self.reply('250 OK: queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0, keep_messages=False):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.delay = delay
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.count = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def connected(self):
+        with self.lock:
+            self.connections += 1
+
+    def received(self, data):
+        with self.lock:
+            self.count += 1
+            if self.keep_messages:
+                self.messages.append(data)
+
+    def start(self):
+        """Serve from a background thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
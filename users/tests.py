@@ -1,3 +1,400 @@
+import email
+import email.policy
+import io
+import json
+import mailbox
+import smtplib
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+from . import jobs, outbox
+from .delivery import DeliveryEngine
+from .mailing_list import import_subscribers, iter_json_values
+from .mime import NewsletterRenderer
+from .models import Job, Newsletter, OutboundEmail, Subscriber
+from .newsletter import enqueue_send, send_newsletter, unsubscribe_token
+from .smtp_sink import SMTPSink
 
 # Create your tests here.
+
+class UnsubscribeLinkTests(TestCase):
+    def setUp(self):
+        self.subscriber = Subscriber.objects.create(email='reader@example.com')
+        self.url = reverse('subscriber-unsubscribe-link', args=[unsubscribe_token(self.subscriber.email)])
+
+    def test_get_does_not_unsubscribe(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.subscriber.refresh_from_db()
+        self.assertTrue(self.subscriber.is_active)
+
+    def test_post_unsubscribes(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.subscriber.refresh_from_db()
+        self.assertFalse(self.subscriber.is_active)
+
+    def test_invalid_token(self):
+        response = self.client.post(reverse('subscriber-unsubscribe-link', args=['forged']))
+        self.assertEqual(response.status_code, 400)
+
+class NewsletterPreviewTests(TestCase):
+    def setUp(self):
+        Subscriber.objects.create(email='first@example.com')
+        Subscriber.objects.create(email='second@example.com')
+        self.newsletter = Newsletter.objects.create(subject='Tides', content='<p>High tide at noon</p>')
+
+    def test_preview_records_nothing(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(EMAIL_FILE_PATH=path):
+            result = send_newsletter(self.newsletter, transport='file', preview=True)
+        self.assertTrue(result['preview'])
+        self.assertEqual(result['success_count'], 2)
+        self.assertFalse(self.newsletter.deliveries.exists())
+        self.newsletter.refresh_from_db()
+        self.assertFalse(self.newsletter.sent)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_real_send_after_preview(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(EMAIL_FILE_PATH=path):
+            send_newsletter(self.newsletter, transport='file', preview=True)
+        result = send_newsletter(self.newsletter)
+        self.assertEqual(result['success_count'], 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.sent)
+
+    def test_mbox_transport_sends_for_real(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(EMAIL_MBOX_PATH=f'{path}/sent.mbox'):
+            result = send_newsletter(self.newsletter, transport='mbox')
+            self.assertEqual(len(mailbox.mbox(f'{path}/sent.mbox')), 2)
+        self.assertNotIn('preview', result)
+        self.assertEqual(set(self.newsletter.deliveries.values_list('status', flat=True)), {'sent'})
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.sent)
+
+    def test_preview_command_defaults_to_console(self):
+        stdout = io.StringIO()
+        with mock.patch('sys.stdout', stdout), mock.patch('builtins.input', return_value='y'):
+            call_command('send_newsletter', id=self.newsletter.pk, preview=True, stdout=stdout)
+        self.assertIn('Preview written for 2 out of 2 subscribers', stdout.getvalue())
+        self.assertIn('Subject: Tides', stdout.getvalue())
+        self.assertFalse(self.newsletter.deliveries.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+class Interrupted(Exception):
+    pass
+
+def interrupt(*args):
+    raise Interrupted
+
+class NewsletterResumeTests(TestCase):
+    def setUp(self):
+        # More than one send batch
+        Subscriber.objects.bulk_create([Subscriber(email=f'reader{index}@example.com') for index in range(70)])
+        self.newsletter = Newsletter.objects.create(subject='Swell report', content='<p>Waist high</p>')
+
+    def recipients(self):
+        return [message.to[0] for message in mail.outbox]
+
+    def test_resume_sends_each_recipient_once(self):
+        with self.assertRaises(Interrupted):
+            send_newsletter(self.newsletter, progress=interrupt)
+        self.assertEqual(len(mail.outbox), 50)
+
+        call_command('send_newsletter', id=self.newsletter.pk, resume=True, stdout=io.StringIO())
+        recipients = self.recipients()
+        self.assertEqual(len(recipients), 70)
+        self.assertEqual(set(recipients), set(Subscriber.objects.values_list('email', flat=True)))
+        self.newsletter.refresh_from_db()
+        self.assertTrue(self.newsletter.sent)
+
+    def test_failed_batch_backs_off_and_is_retried(self):
+        with self.settings(NEWSLETTER_RETRY_BACKOFF=60, EMAIL_SEND_RETRIES=0):
+            before = timezone.now()
+            result = send_newsletter(self.newsletter, transport='users.tests.DisconnectingBackend')
+            self.assertEqual((result['success_count'], result['pending_count']), (0, 70))
+            self.assertAlmostEqual(result['retry_at'] - before, timedelta(seconds=60), delta=timedelta(seconds=1))
+
+            # Still backing off
+            result = send_newsletter(self.newsletter)
+            self.assertEqual((result['success_count'], result['pending_count']), (0, 70))
+            self.assertEqual(mail.outbox, [])
+
+            with mock.patch('django.utils.timezone.now', return_value=before + timedelta(seconds=61)):
+                result = send_newsletter(self.newsletter)
+        self.assertEqual((result['success_count'], result['pending_count']), (70, 0))
+        self.assertEqual(len(set(self.recipients())), 70)
+        self.assertEqual(set(self.newsletter.deliveries.values_list('attempts', flat=True)), {2})
+
+    def test_enqueue_send_reuses_the_pending_job(self):
+        job = enqueue_send(self.newsletter)
+        self.assertEqual(enqueue_send(self.newsletter).pk, job.pk)
+        Job.objects.filter(pk=job.pk).update(status='running')
+        self.assertEqual(enqueue_send(self.newsletter).pk, job.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+        Job.objects.filter(pk=job.pk).update(status='succeeded')
+        self.assertNotEqual(enqueue_send(self.newsletter).pk, job.pk)
+
+class NewsletterRendererTests(TestCase):
+    def test_spliced_message_decodes(self):
+        content = (
+            '<h1>Siargao this week: Café, kinilaw &amp; waves 🌊</h1>\n'
+            # Lines around the 76 character limit, and characters QP must escape
+            f'<p>{"x" * 75}</p>\n<p>{"y" * 76}</p>\n<p>{"é" * 40}</p>\n'
+            '<p>tide=high; swell = 2m </p>'
+        )
+        newsletter = Newsletter(subject='Siargao news: café & surf 🌊', content=content)
+        url = 'https://api.example.com/api/auth/subscribers/unsubscribe/' + 'a1=' * 30 + '/'
+        message = NewsletterRenderer(newsletter, 'noreply@siargao.com').message('Ñora <nora@example.com>', url)
+        data = message.message().as_bytes(linesep='\r\n')
+
+        # Quoted-printable lines stay within 76 characters; headers only need to stay under 998
+        headers, body = data.split(b'\r\n\r\n', 1)
+        self.assertTrue(all(len(line) <= 998 for line in headers.split(b'\r\n')))
+        self.assertTrue(all(len(line) <= 76 for line in body.split(b'\r\n')))
+        parsed = email.message_from_bytes(data, policy=email.policy.default)
+        self.assertEqual(parsed['Subject'], newsletter.subject)
+        self.assertEqual(parsed['To'].addresses[0].addr_spec, 'nora@example.com')
+        self.assertEqual(parsed['To'].addresses[0].display_name, 'Ñora')
+        self.assertTrue(parsed['Message-ID'].startswith('<'))
+        self.assertEqual(parsed['List-Unsubscribe'], f'<{url}>')
+
+        # Hard line breaks are encoded as CRLF
+        text, html = (parsed.get_body((subtype,)).get_content().replace('\r\n', '\n') for subtype in ('plain', 'html'))
+        self.assertEqual(text, strip_tags(content) + f'\n\nUnsubscribe: {url}\n')
+        self.assertEqual(html, content + f'\n<p><a href="{escape(url)}">Unsubscribe</a></p>\n')
+
+    def test_each_copy_gets_its_own_parts(self):
+        renderer = NewsletterRenderer(Newsletter(subject='Tides', content='<p>Hi</p>'), 'noreply@siargao.com')
+        first, second = (
+            email.message_from_bytes(renderer.message(address, f'https://example.com/{address}').message().as_bytes())
+            for address in ['a@example.com', 'b@example.com']
+        )
+        self.assertEqual((first['To'], second['To']), ('a@example.com', 'b@example.com'))
+        self.assertNotEqual(first['Message-ID'], second['Message-ID'])
+        self.assertIn('https://example.com/b@example.com', second.get_payload()[0].get_payload(decode=True).decode())
+
+class JSONImportTests(TestCase):
+    values = [
+        'plain@example.com',
+        {'email': 'ñandú@example.com', 'is_active': False, 'tags': ['a', {'b': [1, 2.5e3]}]},
+        12345678901234567890,
+        {'email': 'quoted"comma,bracket]@example.com'},
+        None,
+    ]
+
+    def decode(self, data, read_size):
+        # Small reads put chunk boundaries inside strings, numbers, nested values and UTF-8 sequences
+        with mock.patch('users.mailing_list.READ_SIZE', read_size):
+            return list(iter_json_values(io.BytesIO(data.encode('utf-8'))))
+
+    def test_values_split_across_reads(self):
+        documents = [
+            json.dumps(self.values, ensure_ascii=False),
+            '\n'.join(json.dumps(value, ensure_ascii=False) for value in self.values) + '\n',
+            '\ufeff' + json.dumps(self.values, indent=2),
+        ]
+        for document in documents:
+            for read_size in (1, 2, 3, 7, 64):
+                with self.subTest(document=document[:20], read_size=read_size):
+                    self.assertEqual(self.decode(document, read_size), self.values)
+
+    def test_empty_input(self):
+        for document in ['', '[]', ' \n ']:
+            with self.subTest(document=document):
+                self.assertEqual(self.decode(document, 4), [])
+
+    def test_malformed_input(self):
+        for document in ['["a@example.com", {"email": ', '["a@example.com", nope]', '{"email": "a@example.com"']:
+            for read_size in (3, 64):
+                with self.subTest(document=document, read_size=read_size):
+                    with self.assertRaises(ValueError):
+                        self.decode(document, read_size)
+
+    def test_malformed_value_before_a_large_tail(self):
+        document = '"a@example.com"\n{"email": nope}\n' + '"b@example.com"\n' * 10000
+        stream = io.BytesIO(document.encode())
+        with mock.patch('users.mailing_list.MAX_RECORD_SIZE', 100), mock.patch('users.mailing_list.READ_SIZE', 64):
+            values = iter_json_values(stream)
+            self.assertEqual(next(values), 'a@example.com')
+            with self.assertRaisesRegex(ValueError, 'at character 16: \'{"email": nope}'):
+                next(values)
+        # Gave up without reading the rest of the input
+        self.assertLess(stream.tell(), 1000)
+
+    def test_import(self):
+        Subscriber.objects.create(email='left@example.com', is_active=False)
+        data = '{"email": "new@example.com"}\n{"email": "left@EXAMPLE.com"}\n"new@example.com"\n"not an email"\n'
+        with mock.patch('users.mailing_list.READ_SIZE', 5):
+            result = import_subscribers(io.BytesIO(data.encode()), format='json')
+        self.assertEqual((result['created'], result['unchanged'], result['duplicates'], result['invalid']), (1, 1, 1, 1))
+        self.assertFalse(Subscriber.objects.get(email='left@example.com').is_active)
+
+class CountingBackend(EmailBackend):
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        type(self).instances += 1
+
+class DisconnectingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+class OutboxTests(TestCase):
+    def queue(self, count):
+        for index in range(count):
+            outbox.queue_email(outbox.CONTACT_CONFIRMATION, f'Thanks #{index}', 'We got your message', f'guest{index}@example.com')
+
+    def test_drain_uses_one_connection(self):
+        self.queue(3)
+        CountingBackend.instances = 0
+        with self.settings(EMAIL_BACKEND='users.tests.CountingBackend', EMAIL_POOL_SIZE=8):
+            counts = outbox.drain()
+        self.assertEqual(counts['sent'], 3)
+        self.assertEqual(CountingBackend.instances, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_retries_follow_the_outbox_backoff(self):
+        self.queue(1)
+        with self.settings(EMAIL_BACKEND='users.tests.DisconnectingBackend', OUTBOX_RETRY_BACKOFF=7,
+                           NEWSLETTER_RETRY_BACKOFF=999, EMAIL_SEND_RETRIES=0):
+            before = timezone.now()
+            counts = outbox.drain()
+        self.assertEqual(counts['retried'], 1)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, 'pending')
+        self.assertAlmostEqual(email.send_after - before, timedelta(seconds=7), delta=timedelta(seconds=1))
+
+def failing_handler(job):
+    raise RuntimeError('boom')
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(jobs, '_next_requeue', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stale_job(self, attempts):
+        locked_at = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT + 1)
+        return Job.objects.create(kind='test.noop', status='running', attempts=attempts, locked_by='dead', locked_at=locked_at)
+
+    def test_claim_takes_the_due_job_once(self):
+        later = jobs.enqueue('test.noop', run_after=timezone.now() + timedelta(hours=1))
+        due = jobs.enqueue('test.noop')
+        job = jobs.claim('worker-1')
+        self.assertEqual(job.pk, due.pk)
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'worker-1', 1))
+        self.assertIsNone(jobs.claim('worker-2'))
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'queued')
+
+    def test_stale_jobs_are_requeued_until_the_last_attempt(self):
+        with self.settings(JOB_MAX_ATTEMPTS=2):
+            retried, exhausted = self.stale_job(attempts=1), self.stale_job(attempts=2)
+            job = jobs.claim('worker-1')
+        self.assertEqual((job.pk, job.attempts, job.locked_by), (retried.pk, 2, 'worker-1'))
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, 'failed')
+
+    def test_stale_jobs_are_looked_for_once_per_lock_timeout(self):
+        with mock.patch.object(jobs, 'requeue_stale') as requeue_stale:
+            jobs.claim('worker-1')
+            jobs.claim('worker-1')
+            self.assertEqual(requeue_stale.call_count, 1)
+            later = timezone.now() + timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+            with mock.patch('django.utils.timezone.now', return_value=later):
+                jobs.claim('worker-1')
+            self.assertEqual(requeue_stale.call_count, 2)
+
+    def test_failed_handler_is_retried_with_backoff(self):
+        job = jobs.enqueue('test.fail')
+        with mock.patch.dict(jobs._handlers, {'test.fail': failing_handler}), \
+                self.settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BACKOFF=60), self.assertLogs('users.jobs', 'ERROR'):
+            before = timezone.now()
+            self.assertEqual(jobs.work(burst=True), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+            self.assertIn('boom', job.error)
+            self.assertAlmostEqual(job.run_after - before, timedelta(seconds=60), delta=timedelta(seconds=1))
+            # Not due yet
+            self.assertEqual(jobs.work(burst=True), 0)
+
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.assertEqual(jobs.work(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+class DroppingSink(SMTPSink):
+    """Hangs up instead of accepting the next `drops` messages."""
+    drops = 0
+
+    def received(self, data):
+        with self.lock:
+            if self.drops:
+                self.drops -= 1
+                raise ConnectionAbortedError('Dropped by the test')
+        super().received(data)
+
+    def handle_error(self, request, client_address):
+        pass
+
+class DeliveryEngineTests(TestCase):
+    def setUp(self):
+        self.sink = DroppingSink().start()
+        self.addCleanup(self.sink.stop)
+
+    def engine(self, **kwargs):
+        return DeliveryEngine(
+            backend='django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1', port=self.sink.port,
+            username='', password='', use_tls=False, use_ssl=False, timeout=5, **kwargs,
+        )
+
+    def messages(self, count):
+        return [EmailMessage('Tides', 'High tide at noon', 'noreply@siargao.com', [f'reader{index}@example.com'])
+                for index in range(count)]
+
+    def test_pooled_connections_are_reused(self):
+        with self.engine(pool_size=3, rate=0) as engine:
+            self.assertEqual(engine.send(self.messages(20)), [None] * 20)
+            connections = self.sink.connections
+            self.assertEqual(engine.send(self.messages(20)), [None] * 20)
+        self.assertEqual(self.sink.count, 40)
+        self.assertLessEqual(connections, 3)
+        self.assertEqual(self.sink.connections, connections)
+
+    def test_rate_limit_caps_throughput(self):
+        # The bucket starts full: 20 messages go at once, the other 20 take a second
+        with self.engine(pool_size=4, rate=20) as engine:
+            start = time.monotonic()
+            engine.send(self.messages(40))
+            elapsed = time.monotonic() - start
+        self.assertEqual(self.sink.count, 40)
+        self.assertGreaterEqual(elapsed, 0.9)
+
+    def test_failed_connection_returns_to_the_pool_closed(self):
+        with self.engine(pool_size=2, rate=0, retries=0) as engine:
+            engine.send(self.messages(8))
+            opened = self.sink.connections
+            self.sink.drops = 1
+            errors = engine.send(self.messages(1))
+            self.assertIsInstance(errors[0], smtplib.SMTPServerDisconnected)
+            self.assertEqual(engine.pool.connections.qsize(), 2)
+            open_connections = [connection for connection in engine.pool.all if connection.connection is not None]
+            self.assertEqual(len(open_connections), opened - 1)
+
+            # The next send through it reconnects
+            self.assertEqual(engine.send(self.messages(8)), [None] * 8)
+        self.assertEqual(self.sink.count, 16)
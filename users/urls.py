@@ -1,13 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import UserViewSet, SubscriberViewSet, NewsletterViewSet, ContactViewSet, register_user, CustomTokenObtainPairView, UserProfileView
+from .views import UserViewSet, SubscriberViewSet, NewsletterViewSet, ContactViewSet, JobViewSet, register_user, CustomTokenObtainPairView, UserProfileView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'subscribers', SubscriberViewSet)
 router.register(r'newsletters', NewsletterViewSet)
 router.register(r'contacts', ContactViewSet)
+router.register(r'jobs', JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,14 +1,21 @@
+import csv
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.parsers import MultiPartParser
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Subscriber, Newsletter, Contact
-from .serializers import UserSerializer, SubscriberSerializer, NewsletterSerializer, ContactSerializer, CustomTokenObtainPairSerializer, UserProfileSerializer
+from rest_framework.reverse import reverse
+from .models import Subscriber, Newsletter, Contact, Job
+from . import mailing_list, outbox
+from .newsletter import delivery_counts, enqueue_send, read_unsubscribe_token
+from .serializers import UserSerializer, SubscriberSerializer, NewsletterSerializer, ContactSerializer, CustomTokenObtainPairSerializer, UserProfileSerializer, JobSerializer
 from django.utils import timezone
 from django.core.mail import send_mail, send_mass_mail, EmailMultiAlternatives
+from django.db import transaction
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
@@ -19,6 +26,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_ordering = ('-date_joined',)
     
     def get_permissions(self):
         if self.action == 'create':
@@ -28,9 +36,10 @@ class UserViewSet(viewsets.ModelViewSet):
 class SubscriberViewSet(viewsets.ModelViewSet):
     queryset = Subscriber.objects.all()
     serializer_class = SubscriberSerializer
+    pagination_ordering = ('-subscribed_at',)
     
     def get_permissions(self):
-        if self.action in ['create', 'destroy', 'unsubscribe', 'resubscribe']:
+        if self.action in ['create', 'destroy', 'unsubscribe', 'unsubscribe_link', 'resubscribe']:
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
     
@@ -77,6 +86,20 @@ class SubscriberViewSet(viewsets.ModelViewSet):
         
         return Response({'detail': 'Successfully unsubscribed'}, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['get', 'post'], url_path=r'unsubscribe/(?P<token>[^/.]+)', url_name='unsubscribe-link')
+    def unsubscribe_link(self, request, token=None):
+        # The signed link in each newsletter; mail clients POST to it for one-click unsubscribe
+        email = read_unsubscribe_token(token)
+        if email is None:
+            return Response({'detail': 'Invalid unsubscribe link'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.method == 'GET':
+            # Link scanners and prefetchers GET every URL in a message, so only POST unsubscribes (RFC 8058)
+            return Response({'detail': 'Confirm by sending a POST request to this link', 'email': email}, status=status.HTTP_200_OK)
+        
+        Subscriber.objects.filter(email=email, is_active=True).update(is_active=False)
+        return Response({'detail': 'Successfully unsubscribed'}, status=status.HTTP_200_OK)
+    
     @action(detail=False, methods=['post'])
     def resubscribe(self, request):
         email = request.data.get('email')
@@ -100,6 +123,30 @@ class SubscriberViewSet(viewsets.ModelViewSet):
         subscriber.save()
         
         return Response(self.get_serializer(subscriber).data, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_subscribers(self, request):
+        """Bulk import from an uploaded `file` (CSV, or JSON for .json/.jsonl names or `format=json`)."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload a CSV or JSON file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        import_format = request.data.get('format') or mailing_list.detect_format(upload.name)
+        try:
+            result = mailing_list.import_subscribers(upload, format=import_format)
+        except (ValueError, csv.Error) as e:
+            return Response({'detail': f'Could not read the file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[mailing_list.CSVRenderer])
+    def export(self, request, format=None):
+        """All subscribers as CSV (email, is_active, subscribed_at), streamed; filter with `?is_active=true|false`."""
+        queryset = Subscriber.objects.all()
+        if 'is_active' in request.query_params:
+            queryset = queryset.filter(is_active=mailing_list.parse_active(request.query_params['is_active']))
+        response = StreamingHttpResponse(mailing_list.export_rows(queryset), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="subscribers-{timezone.now():%Y%m%d}.csv"'
+        return response
 
 class NewsletterViewSet(viewsets.ModelViewSet):
     queryset = Newsletter.objects.all().order_by('-created_at')
@@ -113,74 +160,29 @@ class NewsletterViewSet(viewsets.ModelViewSet):
         if newsletter.sent:
             return Response({'detail': 'This newsletter has already been sent'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get all active subscribers
-        active_subscribers = Subscriber.objects.filter(is_active=True)
-        
-        if not active_subscribers.exists():
+        if not Subscriber.objects.filter(is_active=True).exists():
             return Response({'detail': 'No active subscribers found'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Prepare email data
-        subject = newsletter.subject
-        from_email = 'noreply@siargao.com'
-        html_message = newsletter.content
-        plain_message = strip_tags(html_message)
-        
-        # Use batch email sending for efficiency
-        # This way, all emails will be sent in one batch instead of individual requests
-        batch_size = 50  # Send emails in batches of 50 recipients
-        total_subscribers = active_subscribers.count()
-        success_count = 0
-        failed_emails = []
-        
-        # Process subscribers in batches
-        subscriber_batches = [active_subscribers[i:i+batch_size] for i in range(0, total_subscribers, batch_size)]
-        
-        for batch in subscriber_batches:
-            # For each batch, create a mass email
-            messages = []
-            for subscriber in batch:
-                # Create an email message with both HTML and plain text versions
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=plain_message,
-                    from_email=from_email,
-                    to=[subscriber.email],
-                )
-                email.attach_alternative(html_message, "text/html")
-                messages.append(email)
-            
-            # Send all emails in this batch
-            try:
-                # Use connection to send all emails in one connection
-                connection = email.connection
-                connection.open()
-                connection.send_messages(messages)
-                connection.close()
-                success_count += len(batch)
-            except Exception as e:
-                # If batch sending fails, try sending individually to identify which emails failed
-                for i, subscriber in enumerate(batch):
-                    try:
-                        messages[i].send()
-                        success_count += 1
-                    except Exception as e:
-                        failed_emails.append({
-                            'email': subscriber.email,
-                            'error': str(e)
-                        })
-        
-        # Mark the newsletter as sent if at least one email was successfully sent
-        if success_count > 0:
-            newsletter.sent = True
-            newsletter.sent_at = timezone.now()
-            newsletter.save()
-        
+        # Sent in the background by `manage.py run_jobs`; poll the job for progress
+        job = enqueue_send(newsletter)
         return Response({
-            'detail': f'Newsletter sent to {success_count} out of {total_subscribers} active subscribers',
-            'success_count': success_count,
-            'total_subscribers': total_subscribers,
-            'failed_emails': failed_emails if failed_emails else None
-        })
+            'detail': 'Newsletter queued for sending',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('job-detail', args=[job.id], request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        # Per-recipient progress of the newsletter's send
+        newsletter = self.get_object()
+        return Response({'sent': newsletter.sent, **delivery_counts(newsletter)})
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_ordering = ('-created_at',)
 
 class ContactViewSet(viewsets.ModelViewSet):
     queryset = Contact.objects.all().order_by('-created_at')
@@ -194,36 +196,42 @@ class ContactViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            # Save the contact message
-            contact = serializer.save()
-            
-            # Send notification email to admin about the new contact
-            admin_email = getattr(settings, 'ADMIN_EMAIL', 'admin@siargao.com')
-            
-            # Get reference item information if applicable
-            reference_info = ""
-            if contact.inquiry_type in ['destination', 'activity', 'event'] and contact.reference_id:
-                try:
-                    if contact.inquiry_type == 'destination':
-                        from explore.models import Destination
-                        item = Destination.objects.get(id=contact.reference_id)
-                        reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
-                    elif contact.inquiry_type == 'activity':
-                        from explore.models import Activity
-                        item = Activity.objects.get(id=contact.reference_id)
-                        reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
-                    elif contact.inquiry_type == 'event':
-                        from events.models import Event
-                        item = Event.objects.get(id=contact.reference_id)
-                        reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
-                except Exception:
-                    # If item doesn't exist, continue without reference info
-                    pass
-            
-            # Prepare admin notification email
-            subject = f'New {contact.inquiry_type.title()} Message: {contact.subject}'
-            message = f"""New message received from {contact.name} ({contact.email}):
+            with transaction.atomic():
+                # Save the contact message; its emails are queued in the same transaction
+                contact = serializer.save()
+                self.queue_emails(contact)
             
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def queue_emails(self, contact):
+        """Queue the admin notification and user confirmation in the outbox (see users.outbox)."""
+        admin_email = getattr(settings, 'ADMIN_EMAIL', 'admin@siargao.com')
+        
+        # Get reference item information if applicable
+        reference_info = ""
+        if contact.inquiry_type in ['destination', 'activity', 'event'] and contact.reference_id:
+            try:
+                if contact.inquiry_type == 'destination':
+                    from explore.models import Destination
+                    item = Destination.objects.get(id=contact.reference_id)
+                    reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
+                elif contact.inquiry_type == 'activity':
+                    from explore.models import Activity
+                    item = Activity.objects.get(id=contact.reference_id)
+                    reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
+                elif contact.inquiry_type == 'event':
+                    from events.models import Event
+                    item = Event.objects.get(id=contact.reference_id)
+                    reference_info = f"Reference: {contact.inquiry_type.title()} - {item.title} (ID: {contact.reference_id})\n"
+            except Exception:
+                # If item doesn't exist, continue without reference info
+                pass
+        
+        # Prepare admin notification email
+        subject = f'New {contact.inquiry_type.title()} Message: {contact.subject}'
+        message = f"""New message received from {contact.name} ({contact.email}):
+        
 Type: {dict(Contact.INQUIRY_TYPE_CHOICES).get(contact.inquiry_type, contact.inquiry_type.title())}\n
 {reference_info}Subject: {contact.subject}
 
@@ -233,25 +241,14 @@ Message:
 Sent on: {contact.created_at.strftime('%Y-%m-%d %H:%M:%S')}
 
 You can view and manage all messages in the admin panel.
-            """
-            
-            try:
-                # Send email notification to admin
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email='noreply@siargao.com',
-                    recipient_list=[admin_email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                # Continue even if admin notification fails
-                pass
-            
-            # Send confirmation email to the user
-            try:
-                user_subject = 'Thank you for contacting Siargao Tourism'
-                user_message = f"""Dear {contact.name},
+        """
+        
+        # Notify the admin about the new contact
+        outbox.queue_email(outbox.CONTACT_ADMIN, subject, message, admin_email, contact=contact)
+        
+        # Confirm receipt to the user
+        user_subject = 'Thank you for contacting Siargao Tourism'
+        user_message = f"""Dear {contact.name},
 
 Thank you for your {contact.inquiry_type.replace('_', ' ')} message to Siargao Tourism. We have received your message and will get back to you shortly.
 
@@ -262,22 +259,10 @@ We appreciate your interest in Siargao Island and will respond as soon as possib
 
 Sincerely,
 Siargao Tourism Team
-                """
-                
-                send_mail(
-                    subject=user_subject,
-                    message=user_message,
-                    from_email='noreply@siargao.com',
-                    recipient_list=[contact.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                # Continue even if user confirmation fails
-                pass
-            
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+        """
+        
+        outbox.queue_email(outbox.CONTACT_CONFIRMATION, user_subject, user_message, contact.email, contact=contact)
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         contact = self.get_object()